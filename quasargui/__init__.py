@@ -16,3 +16,4 @@ from quasargui.quasar_form_improved import *
 from quasargui.layout import *
 from quasargui.model import *
 from quasargui.quasar_plugins import *
+from quasargui.data_views import *
@@ -0,0 +1,83 @@
+"""
+This module serves binary assets (eg. rendered plot images) to the frontend by url,
+so they are not base64 encoded and sent through ``evaluate_js``.
+
+The server listens on 127.0.0.1 on a free port, in a daemon thread. It is started at the first call.
+The urls contain a random token, so only the urls handed out by the server can be loaded.
+"""
+import secrets
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, unquote, quote
+
+
+class AssetServer:
+    def __init__(self):
+        self._assets: Dict[str, Tuple[bytes, str]] = {}  # {name: (data, content type)}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._token = secrets.token_urlsafe(16)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='quasargui-asset-server', daemon=True).start()
+
+    def put(self, name: str, data: bytes, content_type: str = 'application/octet-stream') -> str:
+        """
+        Stores (or replaces) an asset.
+
+        :return: the url of the asset, with a version that changes with every put,
+            so the frontend loads the new data.
+        """
+        with self._lock:
+            self._assets[name] = (data, content_type)
+            self._versions[name] = self._versions.get(name, 0) + 1
+            version = self._versions[name]
+        return 'http://127.0.0.1:{port}/{token}/{name}?v={version}'.format(
+            port=self.port, token=self._token, name=quote(name), version=version)
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self._assets.pop(name, None)
+
+    def get(self, name: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            return self._assets.get(name)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                _, token, name = (urlsplit(self.path).path.split('/', 2) + ['', ''])[:3]
+                asset = server.get(unquote(name)) if token == server._token else None
+                if asset is None:
+                    self.send_error(404)
+                    return
+                data, content_type = asset
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+_server: Optional[AssetServer] = None
+_server_lock = threading.Lock()
+
+
+def get_asset_server() -> AssetServer:
+    """
+    :return: the asset server, it is started at the first call.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = AssetServer()
+        return _server
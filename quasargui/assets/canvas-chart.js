@@ -0,0 +1,201 @@
+// Line chart drawn on a canvas, see quasargui.chart.Chart.
+// data and tail are {x0: Float64Array, y0: Float64Array, x1: ..., y1: ...}, the points of series i are
+// the points of data followed by the points of tail (the points appended since data was sent).
+// Dragging pans, the mouse wheel zooms, double click shows all the data.
+// The view is emitted (debounced) as {xmin, xmax, width}, so python can send the data of the view.
+Vue.component('canvas-chart', {
+  props: {
+    data: Object,
+    tail: Object,
+    series: Array,
+    height: {
+      type: Number,
+      default: 300
+    }
+  },
+  data() {
+    return {
+      xmin: null, // null: all the data is shown
+      xmax: null
+    }
+  },
+  created() {
+    this.emitView = _.debounce(() => {
+      this.$emit('view', {
+        xmin: this.xmin,
+        xmax: this.xmax,
+        width: this.$el.clientWidth
+      })
+    }, 100)
+    this.drag = null
+  },
+  mounted() {
+    this.resizeObserver = new ResizeObserver(() => {
+      this.draw()
+      this.emitView()
+    })
+    this.resizeObserver.observe(this.$el)
+    this.draw()
+  },
+  beforeDestroy() {
+    this.resizeObserver.disconnect()
+  },
+  watch: {
+    data() {
+      this.draw()
+    },
+    tail() {
+      this.draw()
+    }
+  },
+  methods: {
+    columns(i) {
+      return [this.data, this.tail]
+        .filter(d => d && d['x' + i] && d['x' + i].length)
+        .map(d => [d['x' + i], d['y' + i]])
+    },
+    dataRange() {
+      let xmin = Infinity
+      let xmax = -Infinity
+      _.each(this.series, (s, i) => {
+        this.columns(i).forEach(([xs]) => {
+          xmin = Math.min(xmin, xs[0])
+          xmax = Math.max(xmax, xs[xs.length - 1])
+        })
+      })
+      return [xmin, xmax]
+    },
+    xRange() {
+      return this.xmin === null ? this.dataRange() : [this.xmin, this.xmax]
+    },
+    draw() {
+      const canvas = this.$el
+      if (!canvas || !canvas.getContext) {
+        return
+      }
+      const dpr = window.devicePixelRatio || 1
+      const width = canvas.clientWidth
+      const height = canvas.clientHeight
+      if (canvas.width !== width * dpr || canvas.height !== height * dpr) {
+        canvas.width = width * dpr
+        canvas.height = height * dpr
+      }
+      const ctx = canvas.getContext('2d')
+      ctx.setTransform(dpr, 0, 0, dpr, 0, 0)
+      ctx.clearRect(0, 0, width, height)
+      const [xmin, xmax] = this.xRange()
+      let ymin = Infinity
+      let ymax = -Infinity
+      _.each(this.series, (s, i) => {
+        this.columns(i).forEach(([xs, ys]) => {
+          for (let k = 0; k < xs.length; k++) {
+            if (xs[k] >= xmin && xs[k] <= xmax && isFinite(ys[k])) {
+              ymin = Math.min(ymin, ys[k])
+              ymax = Math.max(ymax, ys[k])
+            }
+          }
+        })
+      })
+      if (!isFinite(xmin) || !isFinite(xmax) || !isFinite(ymin)) {
+        return
+      }
+      if (ymax === ymin) {
+        ymax += 1
+        ymin -= 1
+      }
+      const margin = 4
+      const sx = (width - 2 * margin) / ((xmax - xmin) || 1)
+      const sy = (height - 2 * margin) / (ymax - ymin)
+      _.each(this.series, (s, i) => {
+        ctx.beginPath()
+        ctx.strokeStyle = s.color
+        ctx.lineWidth = 1
+        let started = false
+        this.columns(i).forEach(([xs, ys]) => {
+          for (let k = 0; k < xs.length; k++) {
+            const px = margin + (xs[k] - xmin) * sx
+            const py = height - margin - (ys[k] - ymin) * sy
+            if (started) {
+              ctx.lineTo(px, py)
+            } else {
+              ctx.moveTo(px, py)
+              started = true
+            }
+          }
+        })
+        ctx.stroke()
+      })
+      ctx.fillStyle = '#666'
+      ctx.font = '11px sans-serif'
+      ctx.textBaseline = 'top'
+      ctx.fillText(_.round(ymax, 6), margin, margin)
+      ctx.textBaseline = 'bottom'
+      ctx.fillText(_.round(ymin, 6), margin, height - margin)
+      ctx.textAlign = 'right'
+      ctx.fillText(`${_.round(xmin, 6)} … ${_.round(xmax, 6)}`, width - margin, height - margin)
+      ctx.textAlign = 'left'
+    },
+    setView(xmin, xmax) {
+      this.xmin = xmin
+      this.xmax = xmax
+      this.draw()
+      this.emitView()
+    },
+    onWheel(event) {
+      event.preventDefault()
+      const [xmin, xmax] = this.xRange()
+      const rect = this.$el.getBoundingClientRect()
+      const x = xmin + (event.clientX - rect.left) / rect.width * (xmax - xmin)
+      const factor = Math.exp(event.deltaY * 0.002)
+      this.setView(x - (x - xmin) * factor, x + (xmax - x) * factor)
+    },
+    onMouseDown(event) {
+      const [xmin, xmax] = this.xRange()
+      this.drag = {
+        clientX: event.clientX,
+        xmin,
+        xmax
+      }
+    },
+    onMouseMove(event) {
+      if (this.drag === null) {
+        return
+      }
+      const {
+        clientX,
+        xmin,
+        xmax
+      } = this.drag
+      const dx = (event.clientX - clientX) / this.$el.clientWidth * (xmax - xmin)
+      this.xmin = xmin - dx
+      this.xmax = xmax - dx
+      this.draw()
+    },
+    onMouseUp() {
+      if (this.drag !== null) {
+        this.drag = null
+        this.emitView()
+      }
+    },
+    onDblClick() {
+      this.setView(null, null)
+    }
+  },
+  render(h) {
+    return h('canvas', {
+      style: {
+        width: '100%',
+        height: this.height + 'px',
+        cursor: 'grab'
+      },
+      on: {
+        wheel: this.onWheel,
+        mousedown: this.onMouseDown,
+        mousemove: this.onMouseMove,
+        mouseup: this.onMouseUp,
+        mouseleave: this.onMouseUp,
+        dblclick: this.onDblClick
+      }
+    })
+  }
+})
@@ -11,6 +11,9 @@ Vue.component('mpld3-figure', {
       this.$el.innerHTML = ''
     }
     setTimeout(() => {
+      if (window.mpld3) {
+        mpld3.remove_figure(this.figId) // the figure is drawn again with the same id
+      }
       var styleObj = document.getElementById(style.id)
       if (styleObj) {
         styleObj.remove()
@@ -28,4 +31,32 @@ Vue.component('mpld3-figure', {
       }
     })
   }
-})
\ No newline at end of file
+})
+
+// Replaces data arrays of a figure drawn by mpld3-figure and redraws the elements that use them.
+// elements is {dataKey: [[elementId, kind]]}, kind is 'lines', 'paths', 'markers' or 'collections'.
+function updateMpld3Data(figId, data, elements) {
+  const fig = _.findLast(mpld3.figures, {
+    figid: figId
+  })
+  if (fig === undefined) {
+    return
+  }
+  _.each(data, (values, key) => {
+    fig.data[key] = values
+    _.each(elements[key], ([id, kind]) => {
+      const element = mpld3.get_element(id, fig)
+      if (!element) {
+        return
+      }
+      if (kind === 'lines' || kind === 'paths') {
+        element.data = values
+        element.path.attr('d', element.datafunc(element.data, element.pathcodes))
+      } else {
+        element.offsets = kind === 'markers' ? fig.parse_offsets(values) : values
+        element.group.remove()
+        element.draw()
+      }
+    })
+  })
+}
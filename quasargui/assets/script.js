@@ -30,6 +30,38 @@ function getPathJs(prop, drop_last_segment) {
   return path.map(v => _.isString(v) ? `['${v}']` : `[${v}]`).join('')
 }
 
+const typedArrayTypes = {
+  int8: Int8Array,
+  uint8: Uint8Array,
+  int16: Int16Array,
+  uint16: Uint16Array,
+  int32: Int32Array,
+  uint32: Uint32Array,
+  float32: Float32Array,
+  float64: Float64Array
+}
+
+function isTypedArrayData(value) {
+  return _.isObject(value) && '$typed' in value
+}
+
+// Decodes ArrayModel data: {$typed, b64} -> TypedArray, also in a dict of columns.
+// The buffers are little-endian, as TypedArrays are on every platform we run on.
+function decodeData(value) {
+  if (isTypedArrayData(value)) {
+    const s = atob(value.b64)
+    const bytes = new Uint8Array(s.length)
+    for (let i = 0; i < s.length; i++) {
+      bytes[i] = s.charCodeAt(i)
+    }
+    return new typedArrayTypes[value['$typed']](bytes.buffer)
+  }
+  if (_.isPlainObject(value) && _.some(value, isTypedArrayData)) {
+    return _.mapValues(value, decodeData)
+  }
+  return value
+}
+
 function getBase(prop) {
   if ('@' in prop) {
     // Model
@@ -42,6 +74,38 @@ function getBase(prop) {
   }
 }
 
+// LRU cache of Vue.compile results by template string.
+// Map iterates in insertion order, so the first key is the least recently used one.
+const templateCache = {
+  maxSize: 1000,
+  entries: new Map(),
+  hits: 0,
+  misses: 0,
+  compile(template) {
+    let compiled = this.entries.get(template)
+    if (compiled !== undefined) {
+      this.hits++
+      this.entries.delete(template)
+    } else {
+      this.misses++
+      compiled = Vue.compile(template)
+      if (this.entries.size >= this.maxSize) {
+        this.entries.delete(this.entries.keys().next().value)
+      }
+    }
+    this.entries.set(template, compiled)
+    return compiled
+  },
+  stats() {
+    return {
+      hits: this.hits,
+      misses: this.misses,
+      size: this.entries.size,
+      max_size: this.maxSize
+    }
+  }
+}
+
 // ref. https://symfonycasts.com/screencast/vue/vue-instance
 // problem: this solution keeps rerendering unnecessarily when used with q-input
 // alternative solution is to send html code and add it within script tags
@@ -66,27 +130,8 @@ Vue.component('dynamic-component', {
       return this.$refs[ref]
     },
     calculateWithProp(computedId, props) {
-      // calculates a Computed within a scoped slot for props
-      if (computedId in this.$root.computed === false) {
-        this.$set(this.$root.computed, computedId, {})
-      }
-      const s = JSON.stringify(props)
-      if (s in this.$root.computed[computedId]) {
-        return this.$root.computed[computedId][s]
-      } else {
-        this.$set(this.$root.computed[computedId], s, {
-          value: undefined
-        })
-        window.pywebview.api.calculate_computed(computedId, [props])
-          .then(response => {
-            if (this.$root.computed[computedId][s].value !== response) {
-              this.$set(this.$root.computed[computedId], s, {
-                value: response
-              })
-            }
-          })
-        return this.$root.computed[computedId][s]
-      }
+      // calculates a Computed within a scoped slot for props (the values of its PropVar's)
+      return this.$root.computedValue(computedId, props)
     },
     assembleTemplate(id, recursive) {
       if (id === undefined || id === null) {
@@ -218,7 +263,7 @@ Vue.component('dynamic-component', {
     renderTemplate(template) {
       // This works even if the template does not have any reactive variables.
       // ref. https://github.com/vuejs/vue/issues/9911
-      const compiled = Vue.compile(template)
+      const compiled = templateCache.compile(template)
       this.$options.staticRenderFns = []
       this._staticTrees = []
       compiled.staticRenderFns.map(fn => (this.$options.staticRenderFns.push(fn)))
@@ -241,6 +286,13 @@ const app = new Vue({
     }
   },
   created() {
+    this.dataWatchers = {} // {id: unwatch function}, not reactive
+    this.computedKeys = {} // {computedId: Map(propsJson -> true)} in LRU order, not reactive
+    this.computedCacheSize = 1000 // per Computed, more if more are in use
+    this.computedInUse = {} // {computedId: Set(propsJson)} used since the last trimComputed, not reactive
+    this.pendingComputed = [] // requests to be sent to calculate_computed_batch after the render
+    this.pythonWrites = new Set() // ids set by python in this tick, their watchers do not echo back
+    this.virtualItemsFns = {} // {pagesId: items-fn of a VirtualList}, not reactive
     document.addEventListener('keydown', (event) => {
       if (
         event.metaKey == true &&
@@ -261,8 +313,8 @@ const app = new Vue({
         }, 50)
       }
     },
-    setMainComponent(component) {
-      const id = this.registerComponent(component)
+    setMainComponent(patches, id) {
+      this.patchComponents(patches)
       this.mainComponentId = id
     },
     setMenu(component) {
@@ -276,14 +328,14 @@ const app = new Vue({
     setKeyShortcut(key, cbId) {
       this.keyShortcuts[key] = cbId
     },
-    registerComponent(component, refresh = false) {
-      if (refresh || (component.id in this.componentStore === false)) {
+    registerComponent(component) {
+      if (component.id in this.componentStore === false) {
         this.$set(this.componentStore, component.id, component)
       }
       const _childrenToIds = (component) => {
         const children = component.children || []
         component.children = children.map(child => {
-          return _.isObject(child) ? this.registerComponent(child, refresh) : child
+          return _.isObject(child) ? this.registerComponent(child) : child
         })
       }
       _childrenToIds(component)
@@ -292,8 +344,37 @@ const app = new Vue({
       })
       return component.id
     },
-    refreshComponent(component) {
-      this.registerComponent(component, refresh = true)
+    patchComponents(patches) {
+      // patches are made by diff_component_descriptor in tools.py,
+      // children are already component ids.
+      patches.forEach(({
+        id,
+        descriptor,
+        changes,
+        props,
+        removed_props
+      }) => {
+        if (descriptor !== undefined) {
+          this.$set(this.componentStore, id, descriptor)
+          return
+        }
+        const d = this.componentStore[id]
+        if (d === undefined) {
+          return
+        }
+        _.each(changes, (value, key) => this.$set(d, key, value))
+        _.each(props, (value, name) => this.$set(d.props, name, value))
+        _.each(removed_props, name => this.$delete(d.props, name))
+      })
+    },
+    getTemplateCacheStats() {
+      return templateCache.stats()
+    },
+    setTemplateCacheSize(maxSize) {
+      templateCache.maxSize = maxSize
+      while (templateCache.entries.size > maxSize) {
+        templateCache.entries.delete(templateCache.entries.keys().next().value)
+      }
     },
     getData(id) {
       return this.data[id]
@@ -302,29 +383,208 @@ const app = new Vue({
       payload.forEach(({
         id,
         path,
-        value
-      }) => this._setData(id, path, value))
+        value,
+        op,
+        readonly
+      }) => {
+        this.pythonWrites.add(id)
+        this._setData(id, path, value, op, readonly)
+      })
+      // the watchers run before this callback
+      this.$nextTick(() => this.pythonWrites.clear())
     },
-    _setData(id, path, value) {
+    _setData(id, path, value, op, readonly) {
+      if (op === 'splice') {
+        // value is [start, deleteCount, ...items]
+        let target = this.data[id]
+        path.forEach(segment => {
+          target = target[segment]
+        })
+        target.splice(...value)
+        return
+      }
+      const decoded = decodeData(value)
       if (path.length) {
         let target = this.data[id]
         for (let i = 0; i < path.length - 1; i++) {
           target = target[path[i]]
         }
-        this.$set(target, path[path.length - 1], value)
+        if (op === 'delete') {
+          this.$delete(target, path[path.length - 1])
+        } else {
+          this.$set(target, path[path.length - 1], decoded)
+        }
         return
       }
       const idIsNew = id in this.data === false
-      this.$set(this.data, id, value)
-      if (idIsNew) {
-        this.$watch(`data.${id}`, {
+      this.$set(this.data, id, decoded)
+      // typed arrays are read-only (and a deep watcher would walk them element by element)
+      if (idIsNew && !readonly && decoded === value) {
+        this.dataWatchers[id] = this.$watch(`data.${id}`, {
           handler: v => {
+            if (this.pythonWrites.has(id)) {
+              return
+            }
             window.pywebview.api.set_model_value(id, v)
           },
           deep: _.isObject(value)
         })
       }
     },
+    dropData(ids) {
+      ids.forEach(id => {
+        if (id in this.dataWatchers) {
+          this.dataWatchers[id]()
+          delete this.dataWatchers[id]
+        }
+        this.$delete(this.data, id)
+        delete this.virtualItemsFns[id]
+      })
+    },
+    lazyTreeLoad(cbId, key, done, fail) {
+      // @lazy-load of LazyTree, python returns the children
+      window.pywebview.api.call_cb(cbId, key).then(done, fail)
+    },
+    evictTreeBranches(componentId, keys) {
+      // drops the loaded children of a LazyTree's nodes with keys (of all the lazy nodes if keys is null)
+      let tree = this.findComponentInstance(componentId)
+      if (tree === null) {
+        return
+      }
+      if (!('lazy' in tree)) {
+        tree = tree.$children[0]
+      }
+      const evicted = keys === null ? null : new Set(keys)
+      const forget = node => {
+        this.$delete(tree.lazy, node[tree.nodeKey])
+        _.each(node[tree.childrenKey], forget)
+      }
+      const evict = nodes => {
+        _.each(nodes, node => {
+          if (node.lazy && (evicted === null || evicted.has(node[tree.nodeKey]))) {
+            forget(node)
+            this.$delete(node, tree.childrenKey)
+          } else {
+            evict(node[tree.childrenKey])
+          }
+        })
+      }
+      evict(tree.nodes)
+    },
+    virtualItemsFn(pagesId, pageSize) {
+      // items-fn of VirtualList, the same function for the same pages (a new function would reset the scroll)
+      // data[pagesId] is {pageIndex: [items]}, items that are not fetched yet are {}
+      if (pagesId in this.virtualItemsFns === false) {
+        this.virtualItemsFns[pagesId] = (from, size) => {
+          const pages = this.data[pagesId] || {}
+          const items = []
+          for (let i = from; i < from + size; i++) {
+            const page = pages[Math.floor(i / pageSize)]
+            items.push(page === undefined ? {} : page[i % pageSize])
+          }
+          return items
+        }
+      }
+      return this.virtualItemsFns[pagesId]
+    },
+    computedValue(computedId, props) {
+      if (computedId in this.computed === false) {
+        this.$set(this.computed, computedId, {})
+        this.computedKeys[computedId] = new Map()
+      }
+      const values = this.computed[computedId]
+      const keys = this.computedKeys[computedId]
+      const s = JSON.stringify(props)
+      this.useComputed(computedId, s)
+      if (s in values) {
+        keys.delete(s)
+        keys.set(s, true)
+        return values[s]
+      }
+      this.$set(values, s, {
+        value: undefined
+      })
+      keys.set(s, true)
+      this.pendingComputed.push({
+        computedId,
+        props,
+        s,
+        values
+      })
+      if (this.pendingComputed.length === 1) {
+        this.$nextTick(this.flushComputed)
+      }
+      return values[s]
+    },
+    useComputed(computedId, s) {
+      if (_.isEmpty(this.computedInUse)) {
+        // after the render
+        this.$nextTick(this.trimComputed)
+      }
+      if (computedId in this.computedInUse === false) {
+        this.computedInUse[computedId] = new Set()
+      }
+      this.computedInUse[computedId].add(s)
+    },
+    trimComputed() {
+      // drops the least recently used values over computedCacheSize,
+      // but not the ones that the last render used (eg. the rows of a big table), they are the most recent ones
+      _.each(this.computedInUse, (used, computedId) => {
+        const keys = this.computedKeys[computedId]
+        const values = this.computed[computedId]
+        if (keys === undefined) {
+          return // invalidated in the meantime
+        }
+        const maxSize = Math.max(this.computedCacheSize, used.size)
+        while (keys.size > maxSize) {
+          const oldest = keys.keys().next().value
+          keys.delete(oldest)
+          this.$delete(values, oldest)
+        }
+      })
+      this.computedInUse = {}
+    },
+    flushComputed() {
+      // all the Computed's requested within a render are calculated in a single call
+      const requests = this.pendingComputed
+      this.pendingComputed = []
+      window.pywebview.api.calculate_computed_batch(requests.map(r => [r.computedId, r.props]))
+        .then(responses => {
+          requests.forEach(({
+            s,
+            values
+          }, i) => {
+            if (s in values && values[s].value !== responses[i]) {
+              this.$set(values, s, {
+                value: responses[i]
+              })
+            }
+          })
+        })
+        .catch(error => {
+          console.error('calculate_computed_batch failed:', error)
+          // the values are requested again when they are rendered again;
+          // not reactively, otherwise a failing calculation would be requested again and again
+          requests.forEach(({
+            computedId,
+            s,
+            values
+          }) => {
+            if (s in values && values[s].value === undefined) {
+              delete values[s]
+              const keys = this.computedKeys[computedId]
+              if (keys !== undefined) {
+                keys.delete(s)
+              }
+            }
+          })
+        })
+    },
+    invalidateComputed(computedId) {
+      // a dependency of the Computed that is not a PropVar has changed
+      this.$delete(this.computed, computedId)
+      delete this.computedKeys[computedId]
+    },
     setComputedValue({
       id,
       propsJson,
@@ -347,27 +607,27 @@ const app = new Vue({
         document.head.appendChild(node)
       })
     },
-    callComponentMethod({
-      component_id,
-      method
-    }) {
+    findComponentInstance(componentId) {
       // We shoot into the structure wherever we find data-component-id 
       // then the vue component must be somewhere among the parents.
       // This is clearly madness but it seems to work for now, for q-input validation. 
-      var el = document.querySelector(`[data-component-id="${component_id}"]`)
-      sendLog(JSON.stringify(el.tagName))
-      if (el === undefined) {
-        return
-      }
-      for (;; el = el.parentNode) {
+      let el = document.querySelector(`[data-component-id="${componentId}"]`)
+      for (; el !== null; el = el.parentNode) {
         sendLog(JSON.stringify(el.tagName))
-        if ('__vue__' in el)
-          break
-        if (el === null) {
-          return
+        if ('__vue__' in el) {
+          return el.__vue__
         }
       }
-      that = el.__vue__
+      return null
+    },
+    callComponentMethod({
+      component_id,
+      method
+    }) {
+      let that = this.findComponentInstance(component_id)
+      if (that === null) {
+        return
+      }
       if (method in that) {
         return that[method].bind(that)()
       } else {
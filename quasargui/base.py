@@ -1,7 +1,8 @@
 import os
 import textwrap
+import weakref
 from inspect import signature
-from typing import Optional, TYPE_CHECKING, Dict, Callable, Union, List
+from typing import Optional, TYPE_CHECKING, Dict, Callable, Union, List, Set
 
 from quasargui.model import Renderable, Reactive, Model, PropVar
 from quasargui.tools import build_props, merge_classes
@@ -14,15 +15,21 @@ if TYPE_CHECKING:
 class EventCallbacks:
     """
     This is a namespace, not a class.
+
+    Callbacks registered with an owner Component live as long as the owner is attached to a window:
+    ``release(owner)`` unregisters them when the owner is detached or dropped,
+    ``restore(owner)`` registers them again, with the same ids, when it is attached again.
     """
     callbacks: Dict[int, Callable] = {}
     max_id: int = 0
 
     @classmethod
-    def register(cls, cb):
+    def register(cls, cb, owner: 'Component' = None):
         cls.max_id += 1
         cb_id = cls.max_id
         cls.callbacks[cb_id] = cb
+        if owner is not None:
+            owner._event_callbacks[cb_id] = cb
         return cb_id
 
     @classmethod
@@ -34,13 +41,29 @@ class EventCallbacks:
         del cls.callbacks[cb_id]
 
     @classmethod
-    def render_cb(cls, cb: EventCBType):
-        return cls.register(cb) if isinstance(cb, Callable) else cb.render_as_data()
+    def release(cls, owner: 'Component'):
+        for cb_id in owner._event_callbacks:
+            cls.callbacks.pop(cb_id, None)
+
+    @classmethod
+    def restore(cls, owner: 'Component'):
+        cls.callbacks.update(owner._event_callbacks)
 
     @classmethod
-    def render_events(cls, events: EventsType):
+    def live_count(cls) -> int:
+        """
+        :return: the number of callbacks that can be currently called from the frontend.
+        """
+        return len(cls.callbacks)
+
+    @classmethod
+    def render_cb(cls, cb: EventCBType, owner: 'Component' = None):
+        return cls.register(cb, owner) if isinstance(cb, Callable) else cb.render_as_data()
+
+    @classmethod
+    def render_events(cls, events: EventsType, owner: 'Component' = None):
         return {
-            event: cls.render_cb(cb)
+            event: cls.render_cb(cb, owner)
             for event, cb in events.items()
         }
 
@@ -69,6 +92,8 @@ class Component:
     script_sources: List[str] = []
     style_sources: List[str] = []
     render_children_immediately: bool = False
+    # setting any of these attributes invalidates the memoized ``vue``:
+    _vue_attributes = frozenset({'component', 'props', 'classes', 'styles', '_children', '_events'})
 
     def __init__(self,
                  children: ChildrenType = None,
@@ -81,7 +106,8 @@ class Component:
         self.styles = build_props(self.defaults.get('styles', {}), styles or {})
         if not hasattr(self, 'props'):
             self.props = build_props(self.defaults.get('props', {}), props or {})
-        self._events = EventCallbacks.render_events(events or {})
+        self._event_callbacks: Dict[int, Callable] = {}
+        self._events = EventCallbacks.render_events(events or {}, owner=self)
         self._children = children or []
         self.api: Optional['Api'] = None
         # other objects that should be attached to the api when this Component is attached:
@@ -89,8 +115,53 @@ class Component:
         Component.max_id += 1
         self.id = Component.max_id
 
+    def __setattr__(self, name, value):
+        if name == '_children':
+            self._adopt_children(self.__dict__.get('_children') or [], value or [])
+        super().__setattr__(name, value)
+        if name in self._vue_attributes:
+            self._invalidate_vue()
+
+    def _adopt_children(self, old_children: ChildrenType, new_children: ChildrenType):
+        for child in old_children:
+            if isinstance(child, Component) and child not in new_children:
+                child._parents.discard(self)
+        for child in new_children:
+            if isinstance(child, Component):
+                child._parents.add(self)
+
+    @property
+    def _parents(self) -> 'weakref.WeakSet[Component]':
+        if '_parent_set' not in self.__dict__:
+            self.__dict__['_parent_set'] = weakref.WeakSet()
+        return self.__dict__['_parent_set']
+
+    def _invalidate_vue(self):
+        """
+        Drops the memoized ``vue`` of this component and of all of its ancestors.
+        Call it (or ``update()``) after changing ``props`` or ``styles`` in place.
+        """
+        stack = [self]
+        seen = set()
+        while stack:
+            component = stack.pop()
+            if component in seen:
+                continue
+            seen.add(component)
+            component.__dict__['_vue_cache'] = None
+            stack.extend(component._parents)
+
     @property
     def vue(self) -> dict:
+        """
+        The descriptor of the component for the frontend.
+        It is memoized until the component or one of its descendants changes.
+        """
+        if self.__dict__.get('_vue_cache') is None:
+            self.__dict__['_vue_cache'] = self._render_vue()
+        return self.__dict__['_vue_cache']
+
+    def _render_vue(self) -> dict:
         props = {
             k: v.render_as_data() if isinstance(v, Renderable) else v
             for k, v in self.props.items()
@@ -144,6 +215,7 @@ class Component:
 
     def set_api(self, api: 'Api', _flush: bool = True):
         self.api = api
+        EventCallbacks.restore(self)
         if self.script_sources:
             self.api.import_scripts(self.script_sources)
         if self.style_sources:
@@ -164,6 +236,7 @@ class Component:
 
     def remove_api(self):
         self.api = None
+        EventCallbacks.release(self)
         for child in self._children:
             if hasattr(child, 'remove_api'):
                 child.remove_api()
@@ -179,19 +252,54 @@ class Component:
         return self._children
 
     def set_children(self, children: ChildrenType):
+        dropped = [child for child in self._children if isinstance(child, Component) and child not in children]
         self._children = children
         if self.api is not None:
+            if dropped:
+                # the dropped components (or their descendants) may have been moved elsewhere
+                shown = self.api.attached_components()
+                for child in dropped:
+                    if child not in shown:
+                        child.release_callbacks(exclude=shown)
+                        self.api.forget_components(child, exclude=shown)
             for child in children:
                 if hasattr(child, 'set_api'):
                     child.set_api(self.api)
             self.update()
 
     def update(self):
+        self._invalidate_vue()
         if self.api is not None:
             self.api.set_component(self.vue)
 
+    def release_callbacks(self, exclude: Set['Component'] = frozenset()):
+        """
+        Unregisters the event callbacks of the component and of its descendants,
+        eg. when it is dropped from the screen. ``set_api`` registers them again.
+
+        :param exclude: descendants that are still shown, they (and their descendants) are skipped.
+        """
+        for component in self.walk(exclude):
+            EventCallbacks.release(component)
+
+    def walk(self, exclude: Set['Component'] = frozenset()):
+        """
+        Iterates over the component and its descendants (children, slots and dependent components).
+
+        :param exclude: descendants that are skipped, with their descendants.
+        """
+        stack = [self]
+        while stack:
+            component = stack.pop()
+            if component is not self and component in exclude:
+                continue
+            yield component
+            stack.extend(child for child in component.children if isinstance(child, Component))
+            stack.extend(dependent for dependent in component.dependents if isinstance(dependent, Component))
+
     def add_event(self, event: str, cb: EventCBType):
-        self._events[event] = EventCallbacks.render_cb(cb)
+        self._events[event] = EventCallbacks.render_cb(cb, owner=self)
+        self._invalidate_vue()
 
     def notify(self, message: str, **params):
         self.api.plugins.notify(message, **params)
@@ -334,6 +442,7 @@ def v_for(
         raise AssertionError
     if key is not None:
         component.props['key'] = key
+    component._invalidate_vue()
     if isinstance(model, Reactive):
         component.dependents.append(model)
     return component
@@ -397,6 +506,7 @@ def _set_prop_safe(component, prop_name, prop_value) -> None:
         raise AssertionError("When using {}, don't define '{}' prop.".format(
             prop_name.replace('-', '_'), prop_name))
     component.props[prop_name] = prop_value
+    component._invalidate_vue()
 
 
 def v_html(
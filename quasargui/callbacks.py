@@ -1,3 +1,4 @@
+import functools
 from typing import TYPE_CHECKING, Callable, Any
 
 if TYPE_CHECKING:
@@ -23,3 +24,52 @@ def call(fun: Callable[['Model'], Any], *args) -> Callable:
     def f():
         fun(*args)
     return f
+
+
+class BackgroundCallback:
+    """
+    An event callback that runs in a worker thread, see ``background``.
+    """
+    def __init__(self, fun: Callable, loading_bar: bool = True):
+        self.fun = fun
+        self.loading_bar = loading_bar
+        functools.update_wrapper(self, fun)
+
+    def __call__(self, *args):
+        return self.fun(*args)
+
+
+class ResultCallback:
+    """
+    An event callback whose return value is sent back to the frontend
+    (the other callbacks' return values are dropped).
+    Used by components that ask python for data, eg. ``LazyTree``.
+    """
+    def __init__(self, fun: Callable):
+        self.fun = fun
+        functools.update_wrapper(self, fun)
+
+    def __call__(self, *args):
+        return self.fun(*args)
+
+
+def background(fun: Callable = None, loading_bar: bool = True):
+    """
+    This is an event callback wrapper, for long-running callbacks.
+    The callback runs in a worker thread (at most ``JsApi.background_workers`` at a time),
+    so the GUI stays responsive meanwhile.
+    Model changes made by the callback are sent to the GUI as usual (batched, see ``Api.flush_interval``).
+    Usage:
+    ::
+
+        QButton('Export', events={'click': background(export)})
+
+        @background(loading_bar=False)
+        def compute():
+            ...
+
+    :param loading_bar: shows a loading bar while the callback runs.
+    """
+    if fun is None:
+        return lambda f: BackgroundCallback(f, loading_bar=loading_bar)
+    return BackgroundCallback(fun, loading_bar=loading_bar)
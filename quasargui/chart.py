@@ -0,0 +1,146 @@
+import array
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Sequence, Union
+
+from quasargui.base import Component
+from quasargui.model import ArrayModel
+from quasargui.tools import build_props, min_max_decimate, lttb
+from quasargui.typing import ClassesType, StylesType, PropsType
+
+SeriesType = Union[Sequence[float], Dict[str, Sequence[float]]]
+
+
+class Chart(Component):
+    """
+    This component is not a quasar component.
+    A line chart drawn on a canvas, for large data (eg. millions of points of telemetry).
+
+    The data is downsampled in python to the width of the chart
+    (``downsample='minmax'`` keeps the minimum and maximum of every pixel column, ``'lttb'`` keeps the shape),
+    and it is sent as typed arrays (see ArrayModel).
+    Dragging pans, the mouse wheel zooms, double click shows all the data;
+    the frontend redraws the data it has immediately,
+    and python sends the data of the new view, downsampled again.
+    ::
+
+        chart = Chart(x=timestamps, y={'temperature': temperatures, 'pressure': pressures})
+        ...
+        chart.append([t], {'temperature': [temperature], 'pressure': [pressure]})
+
+    The x values have to be in ascending order.
+    """
+    component = 'canvas-chart'
+    script_sources = ['canvas-chart.js']
+    colors = ['#1976D2', '#C10015', '#21BA45', '#F2C037', '#9C27B0', '#31CCEC']  # quasar's palette
+
+    def __init__(self,
+                 x: Sequence[float] = None,
+                 y: SeriesType = None,
+                 downsample: str = 'minmax',
+                 height: int = 300,
+                 colors: List[str] = None,
+                 classes: ClassesType = None,
+                 styles: StylesType = None,
+                 props: PropsType = None):
+        """
+        :param x:
+        :param y: the values of a series, or the values of the series by name.
+        :param downsample: 'minmax' or 'lttb'
+        :param height: in pixels
+        :param colors: the colors of the series
+        """
+        if downsample not in {'minmax', 'lttb'}:
+            raise AssertionError('downsample should be "minmax" or "lttb", not "{}"'.format(downsample))
+        self.downsample = downsample
+        self.x = array.array('d', x if x is not None else [])
+        if not isinstance(y, dict):
+            y = {'y': y if y is not None else []}
+        self.y = {name: array.array('d', values) for name, values in y.items()}
+        self.data = ArrayModel({})
+        self.tail = ArrayModel({})  # the points appended since data was sent
+        self._lock = threading.RLock()
+        self._view = {'xmin': None, 'xmax': None, 'width': 1000}
+        self._tail: Dict[str, array.array] = {}
+        self._tail_size = 0
+        colors = colors or self.colors
+        props = build_props({'height': height}, props)
+        props.update({
+            'data': self.data,
+            'tail': self.tail,
+            'series': [{'name': name, 'color': colors[i % len(colors)]} for i, name in enumerate(self.y)],
+        })
+        super().__init__(classes=classes, styles=styles, props=props, events={'view': self._view_changed})
+        self._resample()
+
+    def set_data(self, x: Sequence[float], y: SeriesType):
+        """
+        Replaces the data, the series have to be the same as in the constructor.
+        """
+        if not isinstance(y, dict):
+            y = {'y': y}
+        with self._lock:
+            self.x = array.array('d', x)
+            self.y = {name: array.array('d', y[name]) for name in self.y}
+            self._resample()
+
+    def append(self, x: Sequence[float], y: SeriesType):
+        """
+        Appends points, with x values greater than the ones in the chart.
+        If the chart shows all the data, only the new points are sent
+        (until there are more than the width of the chart, then the data is downsampled again).
+        """
+        if not isinstance(y, dict):
+            y = {'y': y}
+        with self._lock:
+            self.x.extend(x)
+            for name, values in self.y.items():
+                values.extend(y[name])
+            if self._view['xmin'] is not None:
+                return  # a range is shown, the new points are sent when the view changes
+            self._tail_size += len(x)
+            if self._tail_size > self._view['width']:
+                self._resample()
+                return
+            for i, name in enumerate(self.y):
+                self._tail['x{}'.format(i)].extend(x)
+                self._tail['y{}'.format(i)].extend(y[name])
+            self.tail.value = self._tail
+
+    def _view_changed(self, view: dict):
+        with self._lock:
+            self._view = {
+                'xmin': view.get('xmin'),
+                'xmax': view.get('xmax'),
+                'width': max(1, int(view.get('width') or 1000)),
+            }
+            self._resample()
+
+    def _resample(self):
+        with self._lock:
+            xmin, xmax, n_buckets = self._view['xmin'], self._view['xmax'], self._view['width']
+            start, end = 0, len(self.x)
+            if xmin is not None:
+                # half a view on both sides, so panning shows data right away
+                margin = (xmax - xmin) / 2
+                start, end = bisect_left(self.x, xmin - margin), bisect_right(self.x, xmax + margin)
+                n_buckets *= 2
+            columns = {}
+            for i, values in enumerate(self.y.values()):
+                if self.downsample == 'lttb':
+                    xs, ys = lttb(self.x[start:end], values[start:end], 2 * n_buckets)
+                else:
+                    xs, ys = min_max_decimate(self.x[start:end], values[start:end], n_buckets)
+                columns['x{}'.format(i)] = xs
+                columns['y{}'.format(i)] = ys
+            self._tail = {key: array.array('d') for key in columns}
+            self._tail_size = 0
+            if self.api is None:
+                self._set_data(columns)
+            else:
+                with self.api.batch():
+                    self._set_data(columns)
+
+    def _set_data(self, columns: dict):
+        self.data.value = columns
+        self.tail.value = self._tail
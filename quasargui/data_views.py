@@ -0,0 +1,347 @@
+"""
+Components that show large data, fetching only the visible part from python.
+"""
+
+import threading
+from typing import Any, List, Optional, Tuple
+
+from quasargui.base import EventCallbacks, JSRaw, Slot
+from quasargui.callbacks import ResultCallback
+from quasargui.model import Model
+from quasargui.quasar_components import QTable, QTree, QVirtualScroll
+from quasargui.tools import build_props, LRUCache
+from quasargui.typing import ChildrenType, ClassesType, StylesType, PropsType, EventsType
+
+SortType = Optional[Tuple[str, bool]]  # (column name, descending)
+
+
+class DataSource:
+    """
+    The data behind a DataTable.
+    Implement ``count`` and ``fetch``, eg. with SQL queries
+    (``SELECT COUNT(*) ...`` and ``SELECT ... ORDER BY ... LIMIT ... OFFSET ...``).
+    """
+
+    def count(self, filter: Optional[str] = None) -> int:
+        """
+        :return: the number of rows that match filter
+        """
+        raise NotImplementedError
+
+    def fetch(self, offset: int, limit: int, sort: SortType = None, filter: Optional[str] = None) -> List[dict]:
+        """
+        :param offset:
+        :param limit:
+        :param sort: (column name, descending) or None
+        :param filter: the text typed into the table's filter, or None
+        :return: the rows that match filter, sorted by sort, from offset, at most limit rows
+        """
+        raise NotImplementedError
+
+
+class ListDataSource(DataSource):
+    """
+    DataSource for rows that are in the memory.
+    filter keeps the rows that have a value that contains filter (case-insensitive).
+    Rows without a value (None) in the sort column come last,
+    values that cannot be compared (eg. numbers and strings) are sorted as strings.
+    """
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+
+    def _filtered(self, filter: Optional[str]) -> List[dict]:
+        if not filter:
+            return self.rows
+        filter = filter.lower()
+        return [row for row in self.rows if any(filter in str(value).lower() for value in row.values())]
+
+    def count(self, filter: Optional[str] = None) -> int:
+        return len(self._filtered(filter))
+
+    def fetch(self, offset: int, limit: int, sort: SortType = None, filter: Optional[str] = None) -> List[dict]:
+        rows = self._filtered(filter)
+        if sort is not None:
+            column, descending = sort
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            try:
+                present.sort(key=lambda row: row[column], reverse=descending)
+            except TypeError:
+                present.sort(key=lambda row: str(row[column]), reverse=descending)
+            rows = present + missing
+        return rows[offset:offset + limit]
+
+
+class DataTable(QTable):
+    """
+    QTable with server-side pagination:
+    only the rows of the current page are sent to the frontend,
+    sorting and filtering are done by the DataSource.
+    ::
+
+        DataTable(SqlSource(connection), columns=[
+            {'name': 'name', 'label': 'Name', 'field': 'name', 'sortable': True},
+        ])
+
+    ref. https://quasar.dev/vue-components/table#server-side-pagination-filter-and-sorting
+    """
+
+    def __init__(self,
+                 source: DataSource,
+                 columns: List[dict] = None,
+                 row_key: str = 'id',
+                 rows_per_page: int = 20,
+                 filter: Model = None,
+                 classes: ClassesType = None,
+                 styles: StylesType = None,
+                 props: PropsType = None,
+                 events: EventsType = None,
+                 children: ChildrenType = None):
+        """
+        :param source:
+        :param columns: the QTable columns
+        :param row_key: the column that identifies the rows
+        :param rows_per_page: 0 means all rows
+        :param filter: a Model of the filter text, eg. bound to a QInput in the 'top-right' slot.
+        """
+        self.source = source
+        self.rows = Model([])
+        self.loading = Model(False)
+        self.filter = filter or Model('')
+        self.pagination = Model({
+            'page': 1,
+            'rowsPerPage': rows_per_page,
+            'sortBy': None,
+            'descending': False,
+            'rowsNumber': 0
+        })
+        self.pagination.modifiers.add('sync')
+        self._request_lock = threading.Lock()
+        self._last_request = 0
+        props = build_props({'row-key': row_key}, props, {
+            'columns': columns
+        })
+        props.update({
+            'data': self.rows,
+            'loading': self.loading,
+            'filter': self.filter,
+            'pagination': self.pagination,
+        })
+        events = dict(events or {})
+        events['request'] = self._request
+        super().__init__(classes=classes, styles=styles, props=props, events=events, children=children)
+        self.dependents.append(lambda api: self.reload())
+
+    def reload(self):
+        """
+        Fetches the current page again (eg. after the data has changed).
+        """
+        self._load(self.pagination.value, self.filter.value)
+
+    def _request(self, params):
+        self._load(params['pagination'], params.get('filter'))
+
+    def _load(self, pagination: dict, filter: Optional[str]):
+        with self._request_lock:
+            self._last_request += 1
+            request = self._last_request
+        self.loading.value = True
+        try:
+            rows_number = self.source.count(filter or None)
+            rows_per_page = pagination['rowsPerPage'] or rows_number
+            page = pagination['page']
+            sort = (pagination['sortBy'], pagination['descending']) if pagination.get('sortBy') else None
+            rows = self.source.fetch((page - 1) * rows_per_page, rows_per_page, sort, filter or None)
+        finally:
+            if request == self._last_request:
+                self.loading.value = False
+        if request != self._last_request:
+            return  # a newer request has been made in the meantime
+        if self.api is None:
+            self._set_page(rows, pagination, rows_number)
+        else:
+            with self.api.batch():
+                self._set_page(rows, pagination, rows_number)
+
+    def _set_page(self, rows: List[dict], pagination: dict, rows_number: int):
+        self.rows.value = rows
+        self.pagination.value = dict(pagination, rowsNumber=rows_number)
+
+
+class VirtualList(QVirtualScroll):
+    """
+    QVirtualScroll with items fetched from a DataSource as the user scrolls.
+
+    The items are fetched in pages of ``page_size`` items, ``prefetch`` items ahead of and behind the visible ones.
+    At most ``max_pages`` pages are kept in the frontend, the ones farthest from the visible items are dropped
+    (so ``max_pages`` should cover the visible items and the prefetched ones).
+    Items that are not fetched yet are rendered as ``{}``.
+    ::
+
+        VirtualList(ListDataSource(files), props={'style': 'max-height: 300px'}, children=[
+            Slot('default', lambda prop: [QItem(children=[prop['item']['name']])])
+        ])
+
+    ref. https://quasar.dev/vue-components/virtual-scroll#qvirtualscroll-api
+    """
+
+    def __init__(self,
+                 source: DataSource,
+                 page_size: int = 100,
+                 prefetch: int = 100,
+                 max_pages: int = 20,
+                 children: List[Slot] = None,
+                 classes: ClassesType = None,
+                 styles: StylesType = None,
+                 props: PropsType = None,
+                 events: EventsType = None):
+        self.source = source
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.max_pages = max_pages
+        self.pages = Model({})  # {page index: [items]}
+        self.pages.readonly = True  # only python changes the pages
+        self.size = Model(0)
+        self._lock = threading.Lock()
+        self._visible = (0, 0)
+        props = build_props({}, props)
+        props.update({
+            'items-size': self.size,
+            'items-fn': JSRaw('$root.virtualItemsFn({}, {})'.format(self.pages.id, page_size)),
+        })
+        super().__init__(children=children, classes=classes, styles=styles, props=props, events=events)
+        cb_id = EventCallbacks.register(self._scrolled, owner=self)
+        # the event has a Vue component (ref) that cannot be sent to python
+        self.add_event('virtual-scroll', JSRaw(
+            'e => window.pywebview.api.call_cb({cb_id}, {{from: e.from, to: e.to}})'.format(cb_id=cb_id)))
+        self.dependents.append(self.pages)  # it is not a prop, only items-fn reads it
+        self.dependents.append(lambda api: self.reload())
+
+    def reload(self):
+        """
+        Drops the fetched items and fetches the visible ones again (eg. after the data has changed).
+        """
+        with self._lock:
+            self.size.value = self.source.count()
+            self.pages.value = {}
+        self._load_visible()
+
+    def _scrolled(self, params):
+        self._visible = (params['from'], params['to'])
+        self._load_visible()
+
+    def _load_visible(self):
+        start, end = self._visible
+        with self._lock:
+            first_page = max(0, start - self.prefetch) // self.page_size
+            last_page = (min(end + self.prefetch, self.size.value) - 1) // self.page_size
+            pages = dict(self.pages.value)
+            for page in range(first_page, last_page + 1):
+                if page not in pages:
+                    pages[page] = self.source.fetch(page * self.page_size, self.page_size)
+            if len(pages) > self.max_pages:
+                center = (start + end) / 2 / self.page_size
+                far_pages = sorted(pages, key=lambda p: abs(p + 0.5 - center), reverse=True)
+                for page in far_pages[:len(pages) - self.max_pages]:
+                    del pages[page]
+            # only the new and the dropped pages are sent
+            self.pages.value = pages
+
+
+class TreeDataSource:
+    """
+    The data behind a LazyTree.
+    """
+
+    def children(self, node_key: Any = None) -> List[dict]:
+        """
+        :param node_key: None for the root nodes
+        :return: the child nodes of the node, as QTree nodes, eg. ``{'key': ..., 'label': ..., 'lazy': True}``.
+            The children of the nodes with ``'lazy': True`` are loaded when they are expanded.
+        """
+        raise NotImplementedError
+
+
+class LazyTree(QTree):
+    """
+    QTree with the children of the nodes loaded from a TreeDataSource when they are expanded.
+
+    The last ``cache_size`` loaded children lists are cached in python.
+    If ``evict_collapsed`` is True, the children of collapsed nodes are dropped in the frontend
+    (and they are loaded again, from the cache if they are still there, when expanded).
+    ::
+
+        class Files(TreeDataSource):
+            def children(self, node_key=None):
+                path = node_key or '/'
+                return [{'key': entry.path, 'label': entry.name, 'lazy': entry.is_dir()}
+                        for entry in os.scandir(path)]
+
+        LazyTree(Files())
+
+    ref. https://quasar.dev/vue-components/tree#lazy-loading-nodes
+    """
+
+    def __init__(self,
+                 source: TreeDataSource,
+                 node_key: str = 'key',
+                 expanded: Model = None,
+                 cache_size: int = 1000,
+                 evict_collapsed: bool = True,
+                 children: ChildrenType = None,
+                 classes: ClassesType = None,
+                 styles: StylesType = None,
+                 props: PropsType = None,
+                 events: EventsType = None):
+        """
+        :param source:
+        :param node_key: the key of the nodes' unique ids
+        :param expanded: a Model of the list of the expanded nodes' keys
+        :param cache_size: the number of children lists cached in python
+        :param evict_collapsed:
+        """
+        self.source = source
+        self.evict_collapsed = evict_collapsed
+        self._cache = LRUCache(cache_size)
+        # the frontend adds the loaded children to the nodes, python holds only the root nodes
+        self.nodes = Model([])
+        self.nodes.readonly = True
+        self.expanded = expanded or Model([])
+        self.expanded.modifiers.add('sync')
+        self._expanded_keys = set(self.expanded.value)
+        self.expanded.add_callback(self._expanded_changed, immediate=False)
+        props = build_props({}, props)
+        props.update({
+            'nodes': self.nodes,
+            'node-key': node_key,
+            'expanded': self.expanded,
+        })
+        super().__init__(children=children, classes=classes, styles=styles, props=props, events=events)
+        cb_id = EventCallbacks.register(ResultCallback(self.load_children), owner=self)
+        self.add_event('lazy-load', JSRaw(
+            '({{key, done, fail}}) => $root.lazyTreeLoad({cb_id}, key, done, fail)'.format(cb_id=cb_id)))
+        self.dependents.append(lambda api: self.reload())
+
+    def load_children(self, node_key: Any) -> List[dict]:
+        children = self._cache.get(node_key, LRUCache.MISSING)
+        if children is LRUCache.MISSING:
+            children = self.source.children(node_key)
+            self._cache.put(node_key, children)
+        return children
+
+    def reload(self):
+        """
+        Drops the loaded nodes and loads the root nodes again (eg. after the data has changed).
+        """
+        self._cache.clear()
+        if self.api is not None and self.nodes.value:
+            self.api.evict_tree_branches(self.id, None)
+        self.nodes.value = self.source.children(None)
+
+    def _expanded_changed(self):
+        expanded_keys = set(self.expanded.value)
+        collapsed = self._expanded_keys - expanded_keys
+        self._expanded_keys = expanded_keys
+        if collapsed and self.evict_collapsed and self.api is not None:
+            self.api.evict_tree_branches(self.id, list(collapsed))
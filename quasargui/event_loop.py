@@ -0,0 +1,43 @@
+"""
+This module manages the asyncio event loop that runs the ``async def`` event callbacks.
+
+The loop runs in its own daemon thread,
+so a callback that awaits I/O does not block pywebview's js api thread (and the other callbacks).
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Optional, Coroutine
+
+from quasargui.tools import print_error
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    :return: the managed event loop, it is started at the first call.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='quasargui-event-loop', daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coro: Coroutine) -> Future:
+    """
+    Schedules ``coro`` on the managed event loop, errors are printed.
+    :return: a future that can be waited for from any thread.
+    """
+    return asyncio.run_coroutine_threadsafe(_print_errors(coro), get_event_loop())
+
+
+async def _print_errors(coro: Coroutine):
+    try:
+        return await coro
+    except Exception as e:
+        print_error(e)
+        raise e
@@ -1,18 +1,36 @@
+import asyncio
+import dataclasses
+import datetime
 import json
+import math
+import queue
 import re
+import threading
 import weakref
-from typing import List, Tuple, Dict, Union, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from inspect import signature
+from typing import List, Tuple, Dict, Union, Optional, Set
 
 import webview
 from webview import Window
 
 from quasargui import QUASAR_GUI_INDEX_PATH
 from quasargui.base import EventCallbacks
+from quasargui.callbacks import BackgroundCallback, ResultCallback
 from quasargui.components import Component
+from quasargui.event_loop import run_coroutine
 from quasargui.model import Model, Computed
-from quasargui.tools import print_error
+from quasargui.tools import print_error, ModelDataQueue, flatten_component_vue, diff_component_descriptor, join_js
 from quasargui.typing import ValueType, PathType, MenuSpecType, EventCBType
 
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class Plugins:
     """
@@ -35,11 +53,82 @@ class Plugins:
             self.api.import_styles(self.style_sources)
 
 
+class Serializer:
+    """
+    Serializes the values sent to the frontend.
+    Besides json values, it handles datetime, date and time (as isoformat), Decimal,
+    dataclasses, sets, and numpy scalars and arrays (as numbers and lists).
+    NaN and infinite numbers become null (json has no NaN, ``JSON.parse`` fails on it).
+    It uses orjson if it is installed.
+
+    Extend this class to handle more types (override ``default``), then set
+    ::
+
+        Api.serializer_class = YourSerializer
+
+    """
+
+    def dumps(self, value) -> str:
+        if orjson is not None:
+            try:
+                return orjson.dumps(
+                    value, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                ).decode('utf-8')
+            except TypeError:
+                pass  # eg. integers over 64 bits, json handles them
+        try:
+            return json.dumps(value, default=self.default, allow_nan=False)
+        except ValueError:
+            # there are NaN's, they become null, as with orjson
+            return json.dumps(_finite_or_none(value), default=lambda v: _finite_or_none(self.default(v)))
+
+    def default(self, value):
+        """
+        Converts a value that is not json serializable to one that is.
+        """
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dataclasses.asdict(value)
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        if hasattr(value, 'tolist'):
+            # numpy arrays and scalars, array.array
+            return value.tolist()
+        raise TypeError('Object of type {} is not serializable'.format(type(value).__name__))
+
+
+def _finite_or_none(value):
+    """
+    :return: value with the NaN's and infinite floats (in dicts, lists and tuples) replaced by None.
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite_or_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_or_none(v) for v in value]
+    return value
+
+
 class Api:
     """
     python -> js
+
+    Model updates are queued and sent to the frontend in a single ``app.setData`` call.
+    Set ``Api.flush_interval`` (in seconds, eg. ``0.016``) to send the queued updates at most once per tick,
+    or use ``with api.batch(): ...`` to send all the updates of a block at once.
+
+    If ``Api.async_send`` is True, the calls that do not return a value are sent to the frontend
+    by a dedicated thread, so the calling thread does not wait for the browser.
+    Calls that return a value (eg. ``get_model_data``) wait for the calls queued before them.
     """
     plugins_class: type = Plugins
+    serializer_class: type = Serializer
+    flush_interval: Optional[float] = None  # None means that every update is sent immediately
+    async_send: bool = False
 
     def __init__(self,
                  main_component: Component,
@@ -51,20 +140,36 @@ class Api:
             raise AssertionError('A component can be only attached to a single window at a time.')
         self.main_component = main_component
         self.menu = menu
+        self.menu_component: Optional[Component] = None
         self._window = None
         self.debug = debug
         self.render_debug = render_debug
-        self.model_data_queue = []
+        self.model_data_queue = ModelDataQueue()
+        self._model_data_lock = threading.RLock()
+        self._batch_depth = 0
+        self._flush_timer: Optional[threading.Timer] = None
+        self._dropped_model_ids: List[int] = []
+        self._send_queue: Optional[queue.Queue] = None
+        self._send_queue_lock = threading.Lock()
+        self._sender_thread: Optional[threading.Thread] = None
+        self._sent_components: Dict[int, dict] = {}  # the last flat descriptor sent, by component id
+        self._sent_vues: Dict[int, dict] = {}  # the Component.vue these were flattened from
+        self._components_lock = threading.RLock()  # guards the above, components can be updated from any thread
         self.scripts_imported = set()
         self.styles_imported = set()
+        self.serializer = self.serializer_class()
         self.plugins = self.plugins_class(self)
 
     def init(self, window):
-        self._window = window
+        with self._components_lock:
+            self._window = window
+            # nothing has been sent to this window yet
+            self._sent_components.clear()
+            self._sent_vues.clear()
         if self.menu is not None:
             self.set_menu(self.menu)
-        window.evaluate_js('app.setDebug({render_debug})'.format(
-            render_debug=json.dumps(self.render_debug)
+        self._send('app.setDebug({render_debug})'.format(
+            render_debug=self.serializer.dumps(self.render_debug)
         ))
         self.set_main_component(self.main_component)
         self.plugins.init()
@@ -78,6 +183,18 @@ class Api:
         window_api_list = [
             (window, api) for window, api in window_api_list
             if self._window != window]
+        with self._components_lock:
+            self._sent_components.clear()
+            self._sent_vues.clear()
+        with self._model_data_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self.model_data_queue.clear()
+            self._dropped_model_ids = []
+        if self._send_queue is not None:
+            self._send_queue.put((None, None))
+            self._send_queue = None
         window = self._window
         self._window = None
         window.destroy()
@@ -141,9 +258,68 @@ class Api:
             webview.FOLDER_DIALOG, directory=directory)
 
     def evaluate_js(self, code):
-        if self._window is not None:
+        self._send(code)
+
+    def _send(self, code: str):
+        """
+        Evaluates code in the frontend without waiting for the result (if ``async_send`` is set).
+        """
+        if self._window is None:
+            return
+        if self.async_send:
+            self._get_send_queue().put((code, None))
+        else:
             self._window.evaluate_js(code)
 
+    def _call(self, code: str):
+        """
+        Evaluates code in the frontend and returns its result.
+        """
+        if self.async_send:
+            future = Future()
+            self._get_send_queue().put((code, future))
+            return future.result()
+        return self._window.evaluate_js(code)
+
+    def _get_send_queue(self) -> queue.Queue:
+        with self._send_queue_lock:
+            if self._send_queue is None:
+                self._send_queue = queue.Queue()
+                self._sender_thread = threading.Thread(
+                    target=self._sender_loop, args=(self._send_queue,), name='quasargui-sender', daemon=True)
+                self._sender_thread.start()
+            return self._send_queue
+
+    def _sender_loop(self, send_queue: queue.Queue):
+        """
+        Consecutive fire-and-forget calls are pipelined into a single ``evaluate_js``.
+        """
+        pending = None
+        while True:
+            code, future = pending or send_queue.get()
+            pending = None
+            if code is None:
+                return
+            if future is None:
+                codes = [code]
+                while not send_queue.empty():
+                    pending = send_queue.get_nowait()
+                    if pending[1] is not None or pending[0] is None:
+                        break
+                    codes.append(pending[0])
+                    pending = None
+                code = join_js(codes)
+            try:
+                result = self._window.evaluate_js(code) if self._window is not None else None
+            except Exception as e:
+                if future is None:
+                    print_error(e)
+                else:
+                    future.set_exception(e)
+                continue
+            if future is not None:
+                future.set_result(result)
+
     def get_html_elements(self, selector: str) -> dict:
         """
         Use it only as a last resource.
@@ -153,61 +329,231 @@ class Api:
         return self._window.get_elements(selector)
 
     def set_main_component(self, component: Component):
+        if component is not self.main_component:
+            self.main_component.release_callbacks()
+            self.forget_components(self.main_component)
         component.set_api(self)
-        cmd = 'app.setMainComponent({component})'.format(
-            component=json.dumps(component.vue)
-        )
-        if self.debug:
-            print(cmd)
-        self._window.evaluate_js(cmd)
+        self.main_component = component
+        with self._components_lock:
+            if self._window is None:
+                return  # init sends it
+            cmd = 'app.setMainComponent({patches}, {component_id})'.format(
+                patches=self.serializer.dumps(self._component_patches(component.vue)),
+                component_id=self.serializer.dumps(component.id)
+            )
+            if self.debug:
+                print(cmd)
+            self._send(cmd)
 
     def get_model_data(self, data_id: int):
-        return self._window.evaluate_js('app.getData({data_id})'.format(
+        with self._model_data_lock:
+            if self._has_model_data() and not self._batch_depth:
+                self._send_model_data()
+        return self._call('app.getData({data_id})'.format(
             data_id=data_id
         ))
 
-    def set_model_data(self, model_id: int, path: PathType, value: ValueType):
+    async def get_model_data_async(self, data_id: int):
+        """
+        ``get_model_data`` that does not block the event loop while waiting for the frontend.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_model_data, data_id)
+
+    def set_model_data(self, model_id: int, path: PathType, value: ValueType, readonly: bool = False):
+        """
+        Queues a model update. Queued updates of the same model that this one overwrites are dropped.
+
+        :param readonly: the frontend does not send back the changes of the model.
+        """
         if self.debug:
             print('set_model_data', model_id, path, value)
-        self.model_data_queue.append({'id': model_id, 'path': path, 'value': value})
+        entry = {'id': model_id, 'path': path, 'value': value}
+        if readonly:
+            entry['readonly'] = True
+        with self._model_data_lock:
+            self.model_data_queue.push(entry)
+
+    def patch_model_data(self, model_id: int, path: PathType, ops: List[dict]):
+        """
+        Queues changes of a model's value at path,
+        with operations as returned by ``diff_values`` (their paths are relative to path).
+        """
+        if self.debug:
+            print('patch_model_data', model_id, path, ops)
+        with self._model_data_lock:
+            for op in ops:
+                entry = {'id': model_id, **op, 'path': path + op['path']}
+                self.model_data_queue.push(entry)
+
+    @contextmanager
+    def batch(self):
+        """
+        Model updates within the block are sent to the frontend at once, when the block ends.
+        ::
+
+            with component.api.batch():
+                for indicator in indicators:
+                    indicator.value = read_sensor(indicator)
+        """
+        with self._model_data_lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._model_data_lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._has_model_data():
+                    self._send_model_data()
+
+    def drop_model_data(self, model_id: int):
+        """
+        Called when a Model is garbage collected (in any thread).
+        Its value is dropped in the frontend with the next flush.
+        """
+        with self._model_data_lock:
+            self._dropped_model_ids.append(model_id)
+
+    def _has_model_data(self) -> bool:
+        return bool(self.model_data_queue or self._dropped_model_ids)
 
     def flush_model_data(self, data_id=0):
-        if (not self.model_data_queue) or (data_id and self.model_data_queue[0]['id'] != data_id):
+        """
+        :param data_id: if set, flushes only if the first queued update belongs to this model
+            (so nested ``set_api`` calls don't flush before their caller finishes).
+        """
+        with self._model_data_lock:
+            if not self._has_model_data() or self._batch_depth:
+                return
+            first = self.model_data_queue.first()
+            if data_id and first is not None and first['id'] != data_id:
+                return
+            if self.flush_interval:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_interval, self._flush_tick)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+            else:
+                self._send_model_data()
+
+    def _flush_tick(self):
+        with self._model_data_lock:
+            self._flush_timer = None
+            if self._has_model_data() and not self._batch_depth:
+                self._send_model_data()
+
+    def _send_model_data(self):
+        payload = self.model_data_queue.pop_all()
+        dropped, self._dropped_model_ids = self._dropped_model_ids, []
+        if self._window is None:
             return
-        self._window.evaluate_js(
-            'app.setData({payload})'.format(
-                payload=json.dumps(self.model_data_queue)
-            ))
-        self.model_data_queue = []
+        commands = []
+        if payload:
+            commands.append('app.setData({payload})'.format(payload=self.serializer.dumps(payload)))
+        if dropped:
+            commands.append('app.dropData({ids})'.format(ids=self.serializer.dumps(dropped)))
+        self._send(join_js(commands))
 
     def set_component(self, component_vue):
-        if self.debug:
-            print('set_component', component_vue)
-        self._window.evaluate_js(
-            'app.refreshComponent({component_vue})'.format(
-                component_vue=json.dumps(component_vue)))
+        """
+        Sends only the differences to what has been sent for the component and its descendants.
+        """
+        with self._components_lock:
+            if self._window is None:
+                return  # init sends the whole tree
+            patches = self._component_patches(component_vue)
+            if self.debug:
+                print('set_component', patches)
+            if not patches:
+                return
+            # sent while holding the lock, so the patches arrive in the order they were diffed
+            self._send(
+                'app.patchComponents({patches})'.format(
+                    patches=self.serializer.dumps(patches)))
+
+    def attached_components(self) -> Set[Component]:
+        """
+        :return: the components that are shown in the window (the main component, the menu and their descendants).
+        """
+        components = set(self.main_component.walk())
+        if self.menu_component is not None:
+            components.update(self.menu_component.walk())
+        return components
+
+    def forget_components(self, component: Component, exclude: Set[Component] = frozenset()):
+        """
+        Drops what has been sent for the component and its descendants, eg. when it is removed from the screen.
+        If it is shown again, it is sent as a whole.
+
+        :param exclude: descendants that are still shown, they (and their descendants) are kept.
+        """
+        with self._components_lock:
+            for descendant in component.walk(exclude):
+                self._sent_components.pop(descendant.id, None)
+                self._sent_vues.pop(descendant.id, None)
+
+    def _component_patches(self, component_vue: dict) -> List[dict]:
+        """
+        Call it while holding ``_components_lock``, and send the patches: they are recorded as sent.
+        """
+        patches = []
+        for component_id, descriptor in flatten_component_vue(component_vue, self._sent_vues).items():
+            patch = diff_component_descriptor(self._sent_components.get(component_id), descriptor)
+            if patch is not None:
+                patches.append(patch)
+                self._sent_components[component_id] = descriptor
+        return patches
 
     def call_component_method(self, component_id: str, method: str):
         """
         eg. ``call_component_method(12, 'validate()')``
         """
-        return self._window.evaluate_js('app.callComponentMethod({params})'.format(
-            params=json.dumps({'component_id': component_id, 'method': method})
+        return self._call('app.callComponentMethod({params})'.format(
+            params=self.serializer.dumps({'component_id': component_id, 'method': method})
         ))
 
+    def evict_tree_branches(self, component_id: int, keys: Optional[list]):
+        """
+        Drops the loaded children of the nodes with keys of a LazyTree
+        (of all the lazy nodes if keys is None), they are loaded again when expanded.
+        """
+        self._send('app.evictTreeBranches({component_id}, {keys})'.format(
+            component_id=self.serializer.dumps(component_id),
+            keys=self.serializer.dumps(keys)
+        ))
+
+    def invalidate_computed(self, computed_id: int):
+        """
+        Drops the values that the frontend has cached for a Computed with PropVar's.
+        """
+        self._send('app.invalidateComputed({})'.format(self.serializer.dumps(computed_id)))
+
+    def get_template_cache_stats(self) -> dict:
+        """
+        The frontend caches the compiled templates of the rendered components.
+        :return: ``{'hits': int, 'misses': int, 'size': int, 'max_size': int}``
+        """
+        return self._call('app.getTemplateCacheStats()')
+
+    def set_template_cache_size(self, max_size: int):
+        """
+        :param max_size: the number of compiled templates that the frontend keeps.
+        """
+        self._send('app.setTemplateCacheSize({})'.format(self.serializer.dumps(max_size)))
+
     def import_scripts(self, scripts: List[str]):
         not_added = [script for script in scripts if script not in self.scripts_imported]
         if not not_added:
             return
         self.scripts_imported |= set(not_added)
-        self._window.evaluate_js('app.addScripts({})'.format(json.dumps(not_added)))
+        self._send('app.addScripts({})'.format(self.serializer.dumps(not_added)))
 
     def import_styles(self, styles: List[str]):
         not_added = [styles for styles in styles if styles not in self.scripts_imported]
         if not not_added:
             return
         self.styles_imported |= set(not_added)
-        self._window.evaluate_js('app.addStyles({})'.format(json.dumps(not_added)))
+        self._send('app.addStyles({})'.format(self.serializer.dumps(not_added)))
 
     @property
     def is_cocoa(self):
@@ -255,9 +601,9 @@ class Api:
             set_menu_fallback(self, menuspec)
 
     def set_key_shortcut(self, key: str, cb: EventCBType):
-        self._window.evaluate_js('app.setKeyShortcut({key}, {cb})'.format(
-            key=json.dumps(key),
-            cb=json.dumps(EventCallbacks.render_cb(cb))
+        self._send('app.setKeyShortcut({key}, {cb})'.format(
+            key=self.serializer.dumps(key),
+            cb=self.serializer.dumps(EventCallbacks.render_cb(cb))
         ))
 
     def register_sfc(self, component_name: str, vue_file_path: str):
@@ -282,10 +628,10 @@ class Api:
                 template=template.replace('``', '\\``')
             ),
             script)
-        self._window.evaluate_js('registerSfc({component_name}, {script}, {style})'.format(
-            component_name=json.dumps(component_name),
-            script=json.dumps(script),
-            style=json.dumps(style)
+        self._send('registerSfc({component_name}, {script}, {style})'.format(
+            component_name=self.serializer.dumps(component_name),
+            script=self.serializer.dumps(script),
+            style=self.serializer.dumps(style)
         ))
 
 
@@ -294,30 +640,77 @@ class JsApi:
     """
     js -> python
     """
+    background_workers: int = 4  # the maximum number of callbacks that run in the background at a time
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
 
-    def __init__(self, debug):
+    def __init__(self, debug, api: Api = None):
         self.debug = debug
+        self._api = weakref.proxy(api) if api is not None else None
+        self._n_background = 0
+        self._n_background_lock = threading.Lock()
 
     def call_cb(self, cb_id: int, params=None):
-        fun = EventCallbacks.get(cb_id)
-        nargs = fun.__code__.co_argcount
-        if nargs == 0:
-            try:
-                fun()
-            except Exception as e:
-                print_error(e)
-                raise e
-        elif nargs == 1:
-            try:
-                fun(params)
-            except Exception as e:
-                print_error(e)
-                raise e
-        else:
+        try:
+            fun = EventCallbacks.get(cb_id)
+        except KeyError:
+            if self.debug:
+                print('WARNING: callback {} has been released'.format(cb_id))
+            return
+        nargs = len(signature(fun).parameters)
+        if nargs > 1:
             raise AssertionError('Callback {name} has wrong number of parameters ({n})'.format(
-                name=fun.__name__,
+                name=getattr(fun, '__name__', fun),
                 n=nargs
             ))
+        args = [params] if nargs == 1 else []
+        if isinstance(fun, BackgroundCallback):
+            self._run_in_background(fun, args)
+            return
+        if asyncio.iscoroutinefunction(fun):
+            run_coroutine(fun(*args))
+            return
+        try:
+            result = fun(*args)
+        except Exception as e:
+            print_error(e)
+            raise e
+        if isinstance(fun, ResultCallback):
+            if self._api is None:
+                return result
+            # pywebview's json encoder does not know eg. dates and numpy values
+            return json.loads(self._api.serializer.dumps(result))
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=cls.background_workers)
+            return cls._executor
+
+    def _run_in_background(self, fun: BackgroundCallback, args: list):
+        show_loading_bar = fun.loading_bar and self._api is not None
+        if show_loading_bar:
+            with self._n_background_lock:
+                self._n_background += 1
+                if self._n_background == 1:
+                    self._api.plugins.loading_bar_start()
+
+        def run():
+            # not within api.batch(): the batch would hold back the callback's progress updates
+            # (and the updates of the other threads) until the callback returns
+            try:
+                fun(*args)
+            except Exception as e:
+                print_error(e)
+            finally:
+                if show_loading_bar:
+                    with self._n_background_lock:
+                        self._n_background -= 1
+                        if self._n_background == 0:
+                            self._api.plugins.loading_bar_stop()
+
+        self._get_executor().submit(run)
 
     def print_log(self, args):
         """
@@ -329,7 +722,9 @@ class JsApi:
         try:
             if self.debug:
                 print('set_model_value', model_id, value)
-            Model.model_dic[int(model_id)].set_value(value, _jsapi=True)
+            model = Model.model_dic.get(int(model_id))
+            if model is not None:
+                model.set_value(value, _jsapi=True)
         except Exception as e:
             print_error(e)
             raise e
@@ -338,6 +733,21 @@ class JsApi:
         # noinspection PyProtectedMember
         return Computed._calculate_for_props_value(computed_id, props)
 
+    def calculate_computed_batch(self, requests: List[Tuple[int, list]]) -> list:
+        """
+        :param requests: ``[(computed_id, props), ...]``, requested by the frontend within a render.
+        :return: the values in the order of the requests (None if a calculation fails).
+        """
+        values = []
+        for computed_id, props in requests:
+            try:
+                # noinspection PyProtectedMember
+                values.append(Computed._calculate_for_props_value(computed_id, props))
+            except Exception as e:
+                print_error(e)
+                values.append(None)
+        return values
+
 
 WINDOW, API = 0, 1
 window_api_list = []  # : List[Tuple[Window, Api]]
@@ -428,7 +838,7 @@ def create_window(
     window = webview.create_window(
         title or 'Program',
         QUASAR_GUI_INDEX_PATH,
-        js_api=JsApi(debug=debug),
+        js_api=JsApi(debug=debug, api=api),
         min_size=min_size or (200, 100),
         x=position[0],
         y=position[1],
@@ -1,8 +1,14 @@
+import asyncio
+import copy
 import datetime
+import heapq
+import json
+import threading
+import weakref
 from abc import ABCMeta
-from typing import TYPE_CHECKING, Callable, List, Dict, Generic, TypeVar, Union
+from typing import TYPE_CHECKING, Callable, List, Generic, TypeVar, Union, Optional
 
-from quasargui.tools import print_error, get_path, set_path_value
+from quasargui.tools import print_error, get_path, set_path_value, LRUCache, diff_values, encode_typed_array
 from quasargui.typing import ValueType, PathType, PathSegmentType
 
 if TYPE_CHECKING:
@@ -10,6 +16,7 @@ if TYPE_CHECKING:
 
 T = TypeVar('T')
 CallbackType = Callable[[], None]
+_NOT_SENT = object()  # Model's snapshot of the value in the frontend, when it is unknown
 
 
 class Renderable:
@@ -25,14 +32,25 @@ class Renderable:
 
 
 class Reactive(Renderable, Generic[T], metaclass=ABCMeta):
+    # a Computed's level is greater than the levels of its arguments, see ComputedScheduler.
+    _level = 0
 
     @property
     def value(self) -> T:
         raise NotImplementedError
 
+    def _add_dependent(self, computed: 'Computed'):
+        """
+        Registers a Computed that has to be recalculated when the value changes.
+        """
+        raise NotImplementedError
+
     def add_callback(self, fun: CallbackType):
         raise NotImplementedError
 
+    def remove_callback(self, fun: CallbackType):
+        raise NotImplementedError
+
     @property
     def callbacks(self) -> List[CallbackType]:
         raise NotImplementedError
@@ -43,6 +61,40 @@ class Reactive(Renderable, Generic[T], metaclass=ABCMeta):
     def remove_api(self):
         raise NotImplementedError
 
+    async def wait_for(self, condition: Union[T, Callable[[T], bool]], timeout: Optional[float] = None) -> T:
+        """
+        Waits until the value satisfies ``condition``.
+        ::
+
+            await progress.wait_for(lambda value: value >= 100)
+            await status.wait_for('done', timeout=10)
+
+        :param condition: a predicate, or a value that the value has to be equal to.
+        :param timeout: in seconds, raises ``asyncio.TimeoutError`` when it is over.
+        :return: the value
+        """
+        predicate = condition if callable(condition) else (lambda value: value == condition)
+        if predicate(self.value):
+            return self.value
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(value):
+            if not future.done():
+                future.set_result(value)
+
+        def check():
+            # the value may change in any thread
+            value = self.value
+            if predicate(value):
+                loop.call_soon_threadsafe(resolve, value)
+
+        self.add_callback(check)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.remove_callback(check)
+
 
 class Model(Reactive, Generic[T]):
     """
@@ -55,10 +107,21 @@ class Model(Reactive, Generic[T]):
     If a Model has no path, it stores value,
     a Model with path represents access to a "deep" value.
     Model's with path have a path-less counterpart that manages the value handling.
+
+    ``Model.model_dic`` holds weak references only: a path-less Model lives as long as
+    it is referenced by a Component or by one of its path Model's.
+    When it is garbage collected, its value is dropped in the frontend as well.
+
+    When a dict or list value is replaced, only the changed parts are sent to the frontend
+    (up to ``max_diff_ops`` changes, otherwise the whole value).
+    The new value is compared to a copy of what has been sent, so in-place changes are sent too.
+
+    If ``readonly`` is True, the changes made in the frontend are not sent back.
     """
     max_id = 0
-    model_dic: Dict[int, 'Model'] = {}
-    model_dependent_count: Dict[int, int] = {}
+    max_diff_ops = 100
+    readonly = False
+    model_dic: 'weakref.WeakValueDictionary[int, Model]' = weakref.WeakValueDictionary()
 
     @staticmethod
     def no_conversion(value):
@@ -74,13 +137,14 @@ class Model(Reactive, Generic[T]):
             self.id = _id
             if value is not None:
                 raise AssertionError
-            Model.model_dependent_count[self.id] += 1
+            self._root = Model.model_dic[_id]  # keeps the path-less Model alive
         else:
             Model.max_id += 1
             self.id = Model.max_id
             Model.model_dic[self.id] = self
-            Model.model_dependent_count[self.id] = 1
             self._value = value
+            self._finalizer = None
+            self._sent = _NOT_SENT  # a copy of the value in the frontend, see _remember_sent
         self.path = _path or []
         if to_python is not None:
             self.to_python = to_python
@@ -89,33 +153,68 @@ class Model(Reactive, Generic[T]):
         else:
             self.to_python = self.no_conversion
         self.from_python = from_python or self.no_conversion
-        self.api = None
+        self._api = None
         self._callbacks: List[CallbackType] = []
         self._immediate_callbacks: List[CallbackType] = []
+        self._dependents: List['Computed'] = []
         self.modifiers = set()
 
-    def __del__(self):
-        Model.model_dependent_count[self.id] -= 1
-        if Model.model_dependent_count.get(self.id, 0) == 0:
-            del self.model_dic[self.id]
+    @property
+    def api(self) -> Optional['Api']:
+        # a Model with path is attached to the same window as its path-less counterpart
+        return self._root.api if self.path else self._api
 
     def set_api(self, api: 'Api', _flush: bool = True):
-        if self.api == api:
-            return
-        self.api = api
         if self.path:
-            Model.model_dic[self.id].set_api(api, _flush)
+            self._root.set_api(api, _flush)
             return
-        api.set_model_data(self.id, self.path, self.from_python(self.value))
+        if self._api == api:
+            return
+        self._api = api
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, _drop_model_data, weakref.ref(api), self.id)
+        self._finalizer.atexit = False
+        api.set_model_data(self.id, self.path, self.from_python(self.value), readonly=self.readonly)
+        self._remember_sent()
         for cb in self._immediate_callbacks:
             cb()
         if _flush:
             api.flush_model_data(self.id)
 
     def remove_api(self):
-        self.api = None
         if self.path:
-            Model.model_dic[self.id].remove_api()
+            self._root.remove_api()
+        else:
+            self._api = None
+            self._sent = _NOT_SENT
+
+    def _remember_sent(self):
+        """
+        Keeps a copy of the value that the frontend has, the next value is diffed against it.
+        """
+        root = self._root if self.path else self
+        if root.from_python is not Model.no_conversion or type(root._value) not in {dict, list}:
+            root._sent = _NOT_SENT
+        elif not self.path or root._sent is _NOT_SENT:
+            root._sent = copy.deepcopy(root._value)
+        else:
+            try:
+                set_path_value(root._sent, self.path, copy.deepcopy(self.value))
+            except (KeyError, IndexError, TypeError):
+                root._sent = copy.deepcopy(root._value)
+
+    def _get_sent(self):
+        """
+        :return: the copy of the value in the frontend, or _NOT_SENT if it is unknown.
+        """
+        root = self._root if self.path else self
+        if root._sent is _NOT_SENT:
+            return _NOT_SENT
+        try:
+            return get_path(root._sent, self.path)
+        except (KeyError, IndexError, TypeError):
+            return _NOT_SENT
 
     def __getitem__(self, item) -> 'Model':
         return Model(_id=self.id, _path=self.path + [item])
@@ -128,7 +227,7 @@ class Model(Reactive, Generic[T]):
         if not self.path:
             return self._value
         else:
-            return get_path(self.model_dic[self.id]._value, self.path)
+            return get_path(self._root._value, self.path)
 
     @value.setter
     def value(self, value: T):
@@ -140,7 +239,7 @@ class Model(Reactive, Generic[T]):
             if not self.path:
                 self._value = val
             else:
-                set_path_value(self.model_dic[self.id]._value, self.path, val)
+                set_path_value(self._root._value, self.path, val)
 
         if _jsapi:
             # noinspection PyBroadException
@@ -152,19 +251,74 @@ class Model(Reactive, Generic[T]):
                 if self.api is not None and self.api.debug:
                     print('WARNING: could not convert {value} using {converter}'.format(
                         value=value, converter=self.to_python))
-        if self.value == value:
+        old_value = self.value
+        ops = None
+        sent = _NOT_SENT
+        if not _jsapi and self.api is not None and self.from_python is Model.no_conversion:
+            sent = self._get_sent()
+        if sent is not _NOT_SENT and (type(sent) in {dict, list} or type(value) in {dict, list}):
+            # only the changed parts are sent to the frontend,
+            # compared to what it has (old_value may have been changed in place)
+            ops = diff_values(sent, value, max_ops=self.max_diff_ops)
+            if ops == []:
+                _set_value(value)
+                return
+        elif old_value == value:
             return
         _set_value(value)
-        self.update(_jsapi)
+        self.update(_jsapi, _ops=ops)
 
-    def update(self, _jsapi=False):
+    def update(self, _jsapi=False, _ops: List[dict] = None):
         if self.api is not None and not _jsapi:
-            self.api.set_model_data(self.id, self.path, self.from_python(self._value))
+            if _ops is not None:
+                self.api.patch_model_data(self.id, self.path, _ops)
+            else:
+                self.api.set_model_data(self.id, self.path, self.from_python(self.value), readonly=self.readonly)
+        if self.api is not None:
+            self._remember_sent()  # changes from the frontend are in the frontend, too
+        if self._dependents:
+            # before the callbacks, so they see the new values of the dependents
+            computed_scheduler.schedule(self._dependents)
         for callback in self._callbacks:
             callback()
         if self.api is not None and not _jsapi:
             self.api.flush_model_data(self.id)
 
+    def splice(self, start: int, delete_count: int = 0, *items) -> list:
+        """
+        Changes a list value in place, like javascript's ``Array.splice``,
+        and sends only the change to the frontend.
+        ::
+
+            log.splice(0, 100)  # removes the first 100 lines
+
+        :return: the removed items
+        """
+        lst = self.value
+        start, _, _ = slice(start, None).indices(len(lst))
+        delete_count = max(0, min(delete_count, len(lst) - start))
+        removed = lst[start:start + delete_count]
+        lst[start:start + delete_count] = items
+        if self.from_python is Model.no_conversion:
+            self.update(_ops=[{'path': [], 'op': 'splice', 'value': [start, delete_count, *items]}])
+        else:
+            self.update()
+        return removed
+
+    def append(self, item) -> None:
+        self.splice(len(self.value), 0, item)
+
+    def extend(self, items) -> None:
+        self.splice(len(self.value), 0, *items)
+
+    def insert(self, index: int, item) -> None:
+        self.splice(index, 0, item)
+
+    def pop(self, index: int = -1):
+        if not -len(self.value) <= index < len(self.value):
+            raise IndexError('pop index out of range')
+        return self.splice(index, 1)[0]
+
     def set_conversion(self, to_python: Callable[[ValueType], T], from_python: Callable[[T], ValueType] = None):
         self.to_python = to_python
         if from_python:
@@ -198,11 +352,26 @@ class Model(Reactive, Generic[T]):
         if immediate:
             self._immediate_callbacks.append(fun)
 
+    def _add_dependent(self, computed: 'Computed'):
+        self._dependents.append(computed)
+
+    def remove_callback(self, fun: CallbackType):
+        if fun in self._callbacks:
+            self._callbacks.remove(fun)
+        if fun in self._immediate_callbacks:
+            self._immediate_callbacks.remove(fun)
+
     @property
     def callbacks(self) -> List[CallbackType]:
         return self._callbacks
 
 
+def _drop_model_data(api_ref: 'weakref.ReferenceType[Api]', model_id: int):
+    api = api_ref()
+    if api is not None:
+        api.drop_model_data(model_id)
+
+
 class DateTimeModel(Model[datetime.datetime]):
     def __init__(self, value: datetime.datetime):
         super().__init__(value, self._to_python, self._from_python)
@@ -222,6 +391,51 @@ class DateTimeModel(Model[datetime.datetime]):
             return None
 
 
+class ArrayModel(Model):
+    """
+    ArrayModel holds large numeric data (eg. plot data, sensor traces):
+    a numpy array, an ``array.array`` or a dict of them (columns).
+
+    The arrays are sent to the frontend as base64 encoded little-endian buffers,
+    and they appear as TypedArrays (Float64Array etc.) in the frontend,
+    with columns as ``{name: TypedArray}``.
+    ArrayModel is read-only in the frontend: changes are not sent back to python.
+    ::
+
+        trace = ArrayModel(np.zeros(1_000_000))
+        trace.value = read_sensor()  # always sent, the arrays are not compared
+    """
+    readonly = True
+
+    def __init__(self, value: Union[any, dict] = None):
+        super().__init__(value, to_python=Model.no_conversion, from_python=self._encode)
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return {name: encode_typed_array(column) for name, column in value.items()}
+        return encode_typed_array(value)
+
+    def set_value(self, value, _jsapi=False):
+        if _jsapi:
+            return
+        if self.path:
+            raise AssertionError('ArrayModel value can be only set as a whole')
+        self._value = value
+        self.update()
+
+    def render_as_data(self) -> dict:
+        # the value is sent with set_api, it is not embedded into the component
+        data = {'@': self.id}
+        if self.path:
+            data['path'] = self.path
+        if self.modifiers:
+            data['modifiers'] = list(self.modifiers)
+        return data
+
+
 class PropVar(Renderable):
     """
     PropVar is the substitution for Model when a function is passed to a Slot's children parameter,
@@ -264,6 +478,59 @@ class PropVar(Renderable):
         return 'prop{}{}'.format(self.id, path)
 
 
+class ComputedScheduler:
+    """
+    Recalculates the Computed's that depend on a changed value.
+
+    The Computed's are recalculated in the order of their levels
+    (a Computed's level is greater than its arguments' levels),
+    so every Computed is recalculated once per change, after all of its arguments are recalculated.
+    This way a Computed never sees a half-updated state
+    (eg. with ``B = f(A)``, ``C = g(A)``, ``D = h(B, C)``, D is calculated once, with the new B and C).
+    Changes made during the recalculation (eg. by callbacks) join the same run;
+    the Computed's that depend on them (directly or not) are marked dirty right away,
+    so reading them in the meantime calculates them.
+    """
+
+    def __init__(self):
+        self._heap = []  # [(level, seq, computed)]
+        self._queued = set()
+        self._seq = 0
+        self._running = False
+        self._lock = threading.RLock()  # Models can change in any thread
+
+    def schedule(self, computeds: List['Computed']):
+        with self._lock:
+            self._mark_dirty(computeds)
+            for computed in computeds:
+                if computed.id not in self._queued:
+                    self._queued.add(computed.id)
+                    self._seq += 1
+                    heapq.heappush(self._heap, (computed._level, self._seq, computed))
+            if self._running:
+                return
+            self._running = True
+            try:
+                while self._heap:
+                    _, _, computed = heapq.heappop(self._heap)
+                    self._queued.discard(computed.id)
+                    computed._refresh()
+            finally:
+                self._running = False
+
+    @staticmethod
+    def _mark_dirty(computeds: List['Computed']):
+        stack = list(computeds)
+        while stack:
+            computed = stack.pop()
+            if not computed._dirty:
+                computed._dirty = True
+                stack.extend(computed.model._dependents)
+
+
+computed_scheduler = ComputedScheduler()
+
+
 class Computed(Reactive, Generic[T]):
     """
     Computed values are updated automatically whenever their arguments
@@ -271,11 +538,21 @@ class Computed(Reactive, Generic[T]):
     Also, Computed values are independently calculated for PropVars when necessary.
 
     Do not use Computed with PropVars outside a children argument's callable value.
+    The values calculated for PropVars are cached (in the frontend, too) by the values of the PropVars,
+    until any of the other arguments change.
+
+    A Computed that is not attached to a window (and has no callbacks) is lazy:
+    it is calculated only when its value is read or when it gets attached.
+    Attached Computed's are calculated eagerly, even if they are not visible
+    (eg. in an inactive QTabPanel), since python does not know what the frontend shows.
+    To keep a Computed of a hidden part lazy, attach that part only when it is shown
+    (eg. ``set_children`` when the tab is selected).
 
     see: quasargui/examples/prop_vars.py
     """
     max_id = 0
-    computed_dic: Dict[int, 'Computed'] = {}
+    computed_dic: 'weakref.WeakValueDictionary[int, Computed]' = weakref.WeakValueDictionary()
+    props_cache_size = 1000  # the number of values cached for PropVars, per Computed
 
     def __init__(self, fun: Callable, *args: Union[Reactive, PropVar]):
         """
@@ -290,30 +567,71 @@ class Computed(Reactive, Generic[T]):
             raise AssertionError('args have to be Reactive or PropVar.')
         self.props = any(isinstance(arg, PropVar) for arg in args)
         self.args = args
-        if not self.props:
+        if self.props:
+            self.api = None
+            self._props_cache = LRUCache(self.props_cache_size)
+            for arg in args:
+                if isinstance(arg, Reactive):
+                    arg.add_callback(self._invalidate_props_cache)
+        else:
+            self._level = 1 + max((arg._level for arg in args), default=0)
             self.model = Model(None)
-            self.calculate()
-            self.model.set_conversion(type(self.model.value))
+            self._dirty = True
+            self._calculated = False
             for arg in args:
-                arg.add_callback(self.calculate)
+                arg._add_dependent(self)
 
     def calculate(self):
         if self.props:
             raise AssertionError('calculate can be only called if the object does not depend on PropVar')
         values = [a.value for a in self.args]
+        self._dirty = False
         try:
             self.model.value = self.fun(*values)
         except Exception as e:
             print_error(e)
+        if not self._calculated:
+            self._calculated = True
+            self.model.set_conversion(type(self.model.value))
+
+    def _refresh(self):
+        """
+        Called by the scheduler when an argument has changed.
+        """
+        if not self._dirty:
+            return  # it has been calculated in the meantime
+        if self.model.api is not None or self.model.callbacks:
+            self.calculate()
+        elif self.model._dependents:
+            # the value is calculated lazily, but the dependents have to know that it will change
+            computed_scheduler.schedule(self.model._dependents)
 
     @classmethod
-    def _calculate_for_props_value(cls, computed_id: int, props: any):
-        return cls.computed_dic[computed_id].fun(*props)
+    def _calculate_for_props_value(cls, computed_id: int, props: list):
+        """
+        :param props: the values of the PropVar arguments, in order.
+        """
+        self = cls.computed_dic[computed_id]
+        key = json.dumps(props, sort_keys=True)
+        value = self._props_cache.get(key, LRUCache.MISSING)
+        if value is LRUCache.MISSING:
+            prop_values = iter(props)
+            values = [next(prop_values) if isinstance(arg, PropVar) else arg.value for arg in self.args]
+            value = self.fun(*values)
+            self._props_cache.put(key, value)
+        return value
+
+    def _invalidate_props_cache(self):
+        self._props_cache.clear()
+        if self.api is not None:
+            self.api.invalidate_computed(self.id)
 
     @property
     def value(self) -> T:
         if self.props:
             raise AssertionError('value works only if the object does not depend on PropVar')
+        if self._dirty:
+            self.calculate()
         return self.model.value
 
     @property
@@ -326,23 +644,31 @@ class Computed(Reactive, Generic[T]):
         """
         if not self.props:
             return self.model.js_var_name
-        # noinspection PyTypeChecker
-        var_names = [arg.js_var_name for arg in self.args]
+        # the other arguments' values are filled in by _calculate_for_props_value
+        var_names = [arg.js_var_name for arg in self.args if isinstance(arg, PropVar)]
         arg_list = ', '.join(var_names)
-        return "calculateWithProp({}, {}).value".format(self.id, arg_list)
+        return "calculateWithProp({}, [{}]).value".format(self.id, arg_list)
 
     def render_as_data(self) -> dict:
         if not self.props:
+            if self._dirty:
+                self.calculate()
             return self.model.render_as_data()
         else:
             return {'$': self.js_var_name}
 
     def set_api(self, api: 'Api', _flush: bool = True):
-        if not self.props:
+        if self.props:
+            self.api = api
+        else:
+            if self._dirty:
+                self.calculate()
             self.model.set_api(api, _flush=_flush)
 
     def remove_api(self):
-        if not self.props:
+        if self.props:
+            self.api = None
+        else:
             self.model.remove_api()
 
     def add_callback(self, fun: CallbackType):
@@ -350,6 +676,16 @@ class Computed(Reactive, Generic[T]):
             raise AssertionError('Callbacks work only if the object does not depend on PropVar')
         self.model.add_callback(fun)
 
+    def remove_callback(self, fun: CallbackType):
+        if self.props:
+            raise AssertionError('Callbacks work only if the object does not depend on PropVar')
+        self.model.remove_callback(fun)
+
+    def _add_dependent(self, computed: 'Computed'):
+        if self.props:
+            raise AssertionError('Computed values cannot depend on a Computed that depends on PropVar')
+        self.model._add_dependent(computed)
+
     @property
     def callbacks(self) -> List[CallbackType]:
         if self.props:
@@ -1,4 +1,3 @@
-import json
 from typing import TYPE_CHECKING
 
 from quasargui.base import Component
@@ -16,8 +15,9 @@ def set_menu(api: 'Api', menuspec: MenuSpecType):
         return
     menu = assemble_menu_bar(menuspec)
     menu.set_api(api)
+    api.menu_component = menu  # keeps the menu's Model's alive
     api.evaluate_js('app.setMenu({component})'.format(
-        component=json.dumps(menu.vue)
+        component=api.serializer.dumps(menu.vue)
     ))
 
 
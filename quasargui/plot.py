@@ -1,12 +1,17 @@
-import base64
+import threading
+import time
+import warnings
+import weakref
 from io import BytesIO
 from os.path import join
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from quasargui import QUASAR_GUI_ASSETS_PATH
+from quasargui.asset_server import get_asset_server
 from quasargui.base import Component
+from quasargui.main import Api, Serializer
 from quasargui.model import Model
-from quasargui.tools import str_between
+from quasargui.tools import str_between, print_error
 from quasargui.typing import ClassesType, StylesType, PropValueType
 
 
@@ -17,6 +22,18 @@ try:
 except ImportError:
     MPLD3 = False
 
+try:
+    # mpld3's internals, for sending only the changed data (they are not part of mpld3's api).
+    # noinspection PyPackageRequirements,PyUnresolvedReferences,PyProtectedMember
+    from mpld3._display import GENERAL_HTML as MPLD3_HTML  # the template of mpld3.fig_to_html
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    from mpld3.mpld3renderer import MPLD3Renderer
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    from mpld3.mplexporter import Exporter as Mpld3Exporter
+    MPLD3_INTERNALS = True
+except ImportError:
+    MPLD3_INTERNALS = False
+
 try:
     # noinspection PyPackageRequirements,PyUnresolvedReferences
     import matplotlib.pyplot as plt
@@ -44,6 +61,24 @@ class Plot(Component):
     where width and height are in inches."
     ref. https://stackoverflow.com/a/31843288/1031191
 
+    With mpld3, if only the data of the lines, markers and collections change
+    (eg. ``line.set_ydata(...)``, with fixed axis limits), ``set_figure`` sends only the changed data
+    to the figure that is already drawn. Otherwise the figure is drawn again.
+(If the installed mpld3 is not compatible, the figure is always drawn again.)
+
+    With ``max_fps``, the figure is rendered by a background thread, at most max_fps times a second:
+    ``set_figure`` returns immediately, and if it is called again before the figure is rendered,
+    only the latest figure is rendered (the previous frame is dropped, see ``dropped_frames``).
+    Change the figure while holding ``figure_lock``, so it does not change while it is rendered.
+The render thread stops when the window is closed (or the Plot is collected).
+    ::
+
+        plot = Plot(renderer='png', max_fps=10)
+        ...
+        with plot.figure_lock:
+            line.set_ydata(read_instrument())
+        plot.set_figure(fig)
+
     TODO: Bokeh integration, probably via file_html
     ref. https://docs.bokeh.org/en/latest/docs/reference/embed.html#bokeh.embed.file_html
     otherwise a bokeh server needs to start in the background - which is also not impossible...
@@ -57,12 +92,14 @@ class Plot(Component):
     def __init__(self,
                  renderer: PropValueType[str] = 'mpld3',
                  classes: ClassesType = None,
-                 styles: StylesType = None
+                 styles: StylesType = None,
+                 max_fps: Optional[float] = None
                  ):
         """
         :param renderer: valid values are 'png' and 'mpld3'.
         :param classes:
         :param styles:
+        :param max_fps: if set, the figure is rendered in the background, at most max_fps times a second.
         """
         self.renderer = Model(renderer) if isinstance(renderer, str) else renderer
         self.renderer.add_callback(self.update)
@@ -70,10 +107,22 @@ class Plot(Component):
 
         self.fig = None
         self.html = {}
-        self.img_base64 = Model('')
+        self._mpld3_state = None  # (skeleton, {data key: json}, {data key: [[element id, kind]]}) of the drawn figure
+        self._html_stale = False
+        self.img_src = Model('')  # the url of the png, served by the asset server
+        self._asset_finalizer: Optional[weakref.finalize] = None  # removes the png from the asset server
         self.last_renderer = None
+        self.max_fps = max_fps
+        self.figure_lock = threading.RLock()  # held while the figure is rendered
+        self._frame_lock = threading.Lock()
+        self._frame_pending = threading.Event()
+        self._render_thread: Optional[threading.Thread] = None
+        self._render_stopped: Optional[threading.Event] = None  # set to stop the render thread
+        self.rendered_frames = 0
+        self.dropped_frames = 0
+        self.last_render_time = 0.0  # seconds
         super().__init__(classes=classes, styles=styles)
-        self.dependents.append(self.img_base64)
+        self.dependents.append(self.img_src)
 
     def _check_imports(self):
         if self.renderer.value == 'mpld3':
@@ -93,29 +142,178 @@ class Plot(Component):
         self.set_figure(self.fig)
 
     def set_figure(self, fig: 'Figure'):
-        self.fig = fig
+        if self.max_fps is None:
+            self.fig = fig
+            self._render(fig)
+            return
+        with self._frame_lock:
+            if self._frame_pending.is_set() and self._render_thread is not None:
+                self.dropped_frames += 1
+            self.fig = fig
+            self._frame_pending.set()
+            if self._render_thread is None:
+                self._render_stopped = threading.Event()
+                self._render_thread = threading.Thread(
+                    target=_render_loop, args=(weakref.ref(self), self._frame_pending, self._render_stopped),
+                    name='quasargui-plot-{}'.format(self.id), daemon=True)
+                self._render_thread.start()
+
+    def remove_api(self):
+        self._stop_render_thread()
+        super().remove_api()
+
+    def _stop_render_thread(self):
+        """
+        Stops the render thread (without waiting for it), the next ``set_figure`` starts it again.
+        """
+        with self._frame_lock:
+            if self._render_thread is None:
+                return
+            self._render_stopped.set()
+            self._frame_pending.set()  # wakes the thread up
+            self._render_thread = None
+
+    def _render_pending(self):
+        with self._frame_lock:
+            self._frame_pending.clear()
+            fig = self.fig
+        self._render(fig)
+
+    def _render(self, fig: 'Figure'):
+        start = time.perf_counter()
+        with self.figure_lock:
+            changed = self._render_figure(fig)
+        if changed:
+            # outside figure_lock: the api may render vue (which takes figure_lock) while holding its
+            # component lock, so figure_lock is never held while waiting for the api's lock.
+            super().update()
+        self.last_render_time = time.perf_counter() - start
+        self.rendered_frames += 1
+
+    def _render_figure(self, fig: 'Figure') -> bool:
+        """
+        :return: True if the component has changed (it is not sent to the frontend yet).
+        """
         self._check_imports()
         if self.renderer.value == 'mpld3':
-            raw_html = mpld3.fig_to_html(
-                fig,
-                d3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'd3.v5.js'),
-                mpld3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'mpld3.v0.5.2.js'),
-            )
-            self.html['figId'] = str_between(raw_html, '<div id="', '"></div>')
-            self.html['script'] = str_between(raw_html, "<script>", "</script>")
-            self.html['style'] = str_between(raw_html, "<style>", "</style>")
+            self._remove_png()
+            if not MPLD3_INTERNALS:
+                self._set_html(mpld3.fig_to_html(
+                    fig,
+                    d3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'd3.v5.js'),
+                    mpld3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'mpld3.v0.5.2.js'),
+                ))
+                self.last_renderer = 'mpld3'
+                return True
+            exported = self._export_mpld3(fig)
+            if self.last_renderer == 'mpld3' and self.api is not None and self._send_mpld3_data(exported[0]):
+                return False
+            self._render_mpld3(exported)
         elif self.renderer.value == 'png':
             tmpfile = BytesIO()
             fig.savefig(tmpfile, format='png')
-            encoded = base64.b64encode(tmpfile.getvalue()).decode('utf-8')
-            self.img_base64.value = "data:image/png;base64,{}".format(encoded)
-        if self.last_renderer != self.renderer.value or self.renderer.value != 'png':
-            super().update()
+            asset_server = get_asset_server()
+            name = 'plot-{}.png'.format(self.id)
+            self.img_src.value = asset_server.put(name, tmpfile.getvalue(), 'image/png')
+            if self._asset_finalizer is None:
+                self._asset_finalizer = weakref.finalize(self, asset_server.remove, name)
+                self._asset_finalizer.atexit = False
+        changed = self.last_renderer != self.renderer.value or self.renderer.value != 'png'
         self.last_renderer = self.renderer.value
+        return changed
+
+    def _remove_png(self):
+        if self._asset_finalizer is not None:
+            self._asset_finalizer()
+            self._asset_finalizer = None
+
+    @property
+    def img_base64(self) -> Model:
+        """
+        Deprecated, use ``img_src``: the png is not a data url any more, it is served by the asset server.
+        """
+        warnings.warn('Plot.img_base64 is deprecated, use Plot.img_src', DeprecationWarning, stacklevel=2)
+        return self.img_src
+
+    @property
+    def serializer(self) -> Serializer:
+        return self.api.serializer if self.api is not None else Api.serializer_class()
+
+    @staticmethod
+    def _export_mpld3(fig: 'Figure') -> tuple:
+        """
+        Exports the figure once, for both the data updates and the html.
+        :return: (figure dict, extra css, extra js), as in ``mpld3.fig_to_dict`` and ``mpld3.fig_to_html``
+        """
+        renderer = MPLD3Renderer()
+        Mpld3Exporter(renderer, close_mpl=False).run(fig)
+        _, spec, extra_css, extra_js = renderer.finished_figures[0]
+        return spec, extra_css, extra_js
+
+    def _render_mpld3(self, exported: tuple):
+        spec, extra_css, extra_js = exported
+        serializer = self.serializer
+        self._mpld3_state = self._get_mpld3_state(spec, serializer)
+        fig_id = 'plot{}'.format(self.id)  # the same for every drawing, so that updateMpld3Data finds it
+        raw_html = MPLD3_HTML.render(
+            figid=serializer.dumps(fig_id),
+            d3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'd3.v5.js'),
+            mpld3_url='file://' + join(QUASAR_GUI_ASSETS_PATH, 'mpld3.v0.5.2.js'),
+            figure_json=serializer.dumps(spec),
+            extra_css=extra_css,
+            extra_js=extra_js,
+        )
+        self._set_html(raw_html)
+        self._html_stale = False
+
+    def _set_html(self, raw_html: str):
+        self.html['figId'] = str_between(raw_html, '<div id="', '"></div>')
+        self.html['script'] = str_between(raw_html, "<script>", "</script>")
+        self.html['style'] = str_between(raw_html, "<style>", "</style>")
+
+    def _send_mpld3_data(self, spec: dict) -> bool:
+        """
+        Sends the changed data arrays to the figure drawn in the frontend.
+        :param spec: the figure dict, see ``_export_mpld3``
+        :return: False if the figure has changed otherwise too, so it has to be drawn again.
+        """
+        serializer = self.api.serializer
+        skeleton, data, elements = self._get_mpld3_state(spec, serializer)
+        old_skeleton, old_data, _ = self._mpld3_state
+        if skeleton != old_skeleton:
+            return False
+        self._mpld3_state = (skeleton, data, elements)
+        changed = [key for key, value in data.items() if value != old_data.get(key)]
+        if changed:
+            self.api.evaluate_js('updateMpld3Data({fig_id}, {{{data}}}, {elements})'.format(
+                fig_id=serializer.dumps(self.html['figId']),
+                data=','.join('{}:{}'.format(serializer.dumps(key), data[key]) for key in changed),
+                elements=serializer.dumps({key: elements.get(key, []) for key in changed})
+            ))
+            # self.html has the old data, it is rendered again only when the component is rendered again
+            self._html_stale = True
+            self._invalidate_vue()
+        return True
+
+    @staticmethod
+    def _get_mpld3_state(spec: dict, serializer: Serializer) -> tuple:
+        data = {key: serializer.dumps(values) for key, values in spec.get('data', {}).items()}
+        skeleton = serializer.dumps({key: value for key, value in spec.items() if key != 'data'})
+        elements = {}
+        for ax in spec.get('axes', []):
+            for kind, data_prop in [('lines', 'data'), ('paths', 'data'), ('markers', 'data'), ('collections', 'offsets')]:
+                for element in ax.get(kind, []):
+                    key = element.get(data_prop)
+                    if isinstance(key, str):
+                        elements.setdefault(key, []).append([element['id'], kind])
+        return skeleton, data, elements
 
     @property
     def vue(self) -> dict:
         if self.renderer.value == 'mpld3':
+            if self._html_stale:
+                with self.figure_lock:
+                    self._render_mpld3(self._export_mpld3(self.fig))
             return self._merge_vue({
                 'component': 'mpld3-figure',
                 'props': {
@@ -127,9 +325,31 @@ class Plot(Component):
         elif self.renderer.value == 'png':
             return self._merge_vue({
                 'component': 'img',
-                'props': {'src': self.img_base64.render_as_data()}
+                'props': {'src': self.img_src.render_as_data()}
             })
         else:
             return self._merge_vue({
                 'component': 'div'
             })
+
+
+def _render_loop(plot_ref: 'weakref.ReferenceType[Plot]', frame_pending: threading.Event, stopped: threading.Event):
+    """
+    The render thread of a Plot with max_fps.
+    It holds the Plot weakly, and stops when it is collected or when ``stopped`` is set.
+    """
+    while True:
+        frame_pending.wait(timeout=1.0)
+        plot = plot_ref()
+        if plot is None or stopped.is_set():
+            return
+        if not frame_pending.is_set():
+            continue
+        start = time.perf_counter()
+        try:
+            plot._render_pending()
+        except Exception as e:
+            print_error(e)
+        min_interval = 1.0 / plot.max_fps
+        del plot
+        time.sleep(max(0.0, min_interval - (time.perf_counter() - start)))
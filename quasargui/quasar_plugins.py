@@ -1,4 +1,3 @@
-import json
 from typing import Union
 
 from quasargui.base import EventCallbacks
@@ -19,14 +18,14 @@ class QuasarPlugins(Plugins):
         if 'html' not in params and '\n' in message:
             params['message'] = message.replace('\n', '<br>')
             params['html'] = True
-        self.api.evaluate_js('quasarPlugins.notify(app, {params})'.format(params=json.dumps(params)))
+        self.api.evaluate_js('quasarPlugins.notify(app, {params})'.format(params=self.api.serializer.dumps(params)))
 
     def dialog(self, props: PropsType, events: EventsType) -> None:
         """
         reference: https://quasar.dev/quasar-plugins/dialog#predefined
         """
         self.api.evaluate_js('quasarPlugins.dialog(app, {params}, {events})'.format(
-            params=json.dumps(props),
+            params=self.api.serializer.dumps(props),
             events=EventCallbacks.render_events(events)
         ))
 
@@ -38,7 +37,7 @@ class QuasarPlugins(Plugins):
         """
         if value is None:
             value = "auto"
-        self.api.evaluate_js('app.$q.dark.set({})'.format(json.dumps(value)))
+        self.api.evaluate_js('app.$q.dark.set({})'.format(self.api.serializer.dumps(value)))
 
     def dark_toggle(self) -> None:
         """
@@ -51,7 +50,7 @@ class QuasarPlugins(Plugins):
         reference: https://quasar.dev/quasar-plugins/bottom-sheet#usage
         """
         self.api.evaluate_js('quasarPlugins.bottomSheet(app, {params}, {events})'.format(
-            params=json.dumps(props),
+            params=self.api.serializer.dumps(props),
             events=EventCallbacks.render_events(events)
         ))
 
@@ -60,7 +59,7 @@ class QuasarPlugins(Plugins):
         Fades the content and shows a spinner, with an optional text to explain the reason the app is loading.
         reference: https://quasar.dev/quasar-plugins/loading#usage
         """
-        self.api.evaluate_js('app.$q.loading.show({params})'.format(params=json.dumps(params)))
+        self.api.evaluate_js('app.$q.loading.show({params})'.format(params=self.api.serializer.dumps(params)))
 
     def loading_hide(self):
         self.api.evaluate_js('app.$q.loading.hide()')
@@ -78,7 +77,7 @@ class QuasarPlugins(Plugins):
 
     def loading_bar_increment(self, value: float):
         assert (0.0 < value < 1.0)
-        self.api.evaluate_js('app.$q.loadingBar.increment({})'.format(json.dumps(value)))
+        self.api.evaluate_js('app.$q.loadingBar.increment({})'.format(self.api.serializer.dumps(value)))
 
 
 # register QuasarPlugins
@@ -1,8 +1,19 @@
+import array
+import base64
+import sys
+import threading
 import traceback
-from typing import List, Union
+from collections import OrderedDict
+from typing import List, Union, Dict, Optional, Hashable
 
 from quasargui.typing import PathType
 
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def flatten(lst: List[list]) -> list:
     return [item for sublist in lst for item in sublist]
@@ -69,9 +80,356 @@ def set_path_value(dic: Union[dict, list], path: PathType, value: any) -> None:
     target[path[-1]] = value
 
 
+def encode_typed_array(values) -> dict:
+    """
+    Encodes a numeric array (numpy array, ``array.array`` or list of numbers) as
+    ``{'$typed': 'float64', 'b64': <base64 of the little-endian buffer>}``,
+    that the frontend decodes into a TypedArray (Float64Array in this case).
+
+    Types without a TypedArray counterpart (eg. 64-bit integers, bools) are sent as float64.
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        dtype = values.dtype
+        if not (dtype.kind == 'f' and dtype.itemsize in {4, 8} or dtype.kind in 'iu' and dtype.itemsize <= 4):
+            dtype = np.dtype('float64')
+        type_name = {'f': 'float', 'i': 'int', 'u': 'uint'}[dtype.kind] + str(dtype.itemsize * 8)
+        data = np.ascontiguousarray(values.ravel(), dtype=dtype.newbyteorder('<')).tobytes()
+    else:
+        if not isinstance(values, array.array):
+            values = array.array('d', values)
+        if values.typecode in 'fd':
+            kind = 'float'
+        elif values.itemsize > 4:
+            kind = 'float'
+            values = array.array('d', values)
+        else:
+            kind = 'uint' if values.typecode.isupper() else 'int'
+        type_name = kind + str(values.itemsize * 8)
+        if sys.byteorder == 'big':
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        data = values.tobytes()
+    return {'$typed': type_name, 'b64': base64.b64encode(data).decode('ascii')}
+
+
+def _as_float_arrays(x, y):
+    if np is not None:
+        return np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+    return array.array('d', x), array.array('d', y)
+
+
+def min_max_decimate(x, y, n_buckets: int):
+    """
+    Downsamples a line to at most ``2 * n_buckets`` points:
+    the points with the minimum and the maximum y of each bucket (of consecutive points), in their order.
+    The peaks are kept, so a chart that is n_buckets pixels wide looks the same.
+
+    :return: (x, y), as numpy arrays if numpy is installed, as ``array.array('d')`` otherwise.
+    """
+    x, y = _as_float_arrays(x, y)
+    n = len(x)
+    if n <= 2 * n_buckets:
+        return x, y
+    bucket_size = -(-n // n_buckets)
+    if np is not None:
+        n_full = n // bucket_size * bucket_size
+        buckets = y[:n_full].reshape(-1, bucket_size)
+        offsets = np.arange(0, n_full, bucket_size)
+        mins = offsets + buckets.argmin(axis=1)
+        maxs = offsets + buckets.argmax(axis=1)
+        indices = np.stack([np.minimum(mins, maxs), np.maximum(mins, maxs)], axis=1).ravel()
+        if n_full < n:
+            rest = y[n_full:]
+            indices = np.concatenate([indices, sorted({n_full + int(rest.argmin()), n_full + int(rest.argmax())})])
+        return x[indices], y[indices]
+    out_x, out_y = array.array('d'), array.array('d')
+    for start in range(0, n, bucket_size):
+        bucket = y[start:start + bucket_size]
+        i_min = start + min(range(len(bucket)), key=bucket.__getitem__)
+        i_max = start + max(range(len(bucket)), key=bucket.__getitem__)
+        for i in sorted({i_min, i_max}):
+            out_x.append(x[i])
+            out_y.append(y[i])
+    return out_x, out_y
+
+
+def lttb(x, y, n_out: int):
+    """
+    Downsamples a line to ``n_out`` points with the Largest-Triangle-Three-Buckets algorithm:
+    from each bucket, it keeps the point that forms the largest triangle
+    with the previous kept point and the average of the next bucket.
+
+    :return: (x, y), as numpy arrays if numpy is installed, as ``array.array('d')`` otherwise.
+    """
+    x, y = _as_float_arrays(x, y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    every = (n - 2) / (n_out - 2)
+    indices = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if np is not None:
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+            areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+            a = start + int(areas.argmax())
+        else:
+            avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+            avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+            a = max(range(start, end), key=lambda j: abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])))
+        indices.append(a)
+    indices.append(n - 1)
+    if np is not None:
+        return x[indices], y[indices]
+    return array.array('d', (x[i] for i in indices)), array.array('d', (y[i] for i in indices))
+
+
+def join_js(codes: List[str]) -> str:
+    """
+    Joins javascript snippets into one, to be evaluated at once.
+    The snippets stay independent: if one throws, the error is logged (in the console) and the rest still run.
+    """
+    if len(codes) == 1:
+        return codes[0]
+    return '\n'.join('try {{\n{}\n}} catch (e) {{ console.error(e) }}'.format(code) for code in codes)
+
+
 def static_vars(**kwargs):
     def decorate(func):
         for k in kwargs:
             setattr(func, k, kwargs[k])
         return func
     return decorate
+
+
+def flatten_component_vue(vue: dict, known: Dict[int, dict] = None) -> Dict[int, dict]:
+    """
+    Splits a nested component descriptor (see ``Component.vue``) into flat descriptors by component id.
+    Children (and slot children) are replaced by their ids,
+    the same way as the frontend's ``registerComponent`` stores them.
+
+    :param known: nested descriptors by id that have already been flattened, it is updated in place.
+        Since ``Component.vue`` is memoized, an identical descriptor object means an unchanged subtree,
+        so it is skipped.
+    """
+    known = {} if known is None else known
+
+    def children_to_ids(children: list) -> list:
+        ids = []
+        for child in children or []:
+            if isinstance(child, dict):
+                stack.append(child)
+                ids.append(child['id'])
+            else:
+                ids.append(child)
+        return ids
+
+    result = {}
+    stack = [vue]
+    while stack:
+        d = stack.pop()
+        if known.get(d['id']) is d:
+            continue
+        known[d['id']] = d
+        flat = dict(d)
+        flat['children'] = children_to_ids(d.get('children'))
+        if d.get('slots'):
+            flat['slots'] = {
+                name: dict(slot, children=children_to_ids(slot.get('children')))
+                for name, slot in d['slots'].items()
+            }
+        result[d['id']] = flat
+    return result
+
+
+def diff_component_descriptor(old: Optional[dict], new: dict) -> Optional[dict]:
+    """
+    :return: the patch that turns the flat descriptor ``old`` into ``new`` (None if they are the same):
+        ``{'id': ..., 'descriptor': new}`` if ``old`` is missing or has different keys, otherwise
+        ``{'id': ..., 'changes': {key: value}, 'props': {name: value}, 'removed_props': [name]}``,
+        without the empty parts.
+    """
+    if old is None or old.keys() != new.keys():
+        return {'id': new['id'], 'descriptor': new}
+    patch = {'id': new['id']}
+    changes = {key: value for key, value in new.items() if key != 'props' and old[key] != value}
+    if changes:
+        patch['changes'] = changes
+    old_props, new_props = old.get('props') or {}, new.get('props') or {}
+    props = {name: value for name, value in new_props.items()
+             if name not in old_props or old_props[name] != value}
+    if props:
+        patch['props'] = props
+    removed_props = [name for name in old_props if name not in new_props]
+    if removed_props:
+        patch['removed_props'] = removed_props
+    return patch if len(patch) > 1 else None
+
+
+def diff_values(old: any, new: any, max_ops: int = 100) -> Optional[List[dict]]:
+    """
+    Compares two (json-like) values and returns the operations that turn ``old`` into ``new``:
+
+    - ``{'path': [...], 'value': value}`` sets the value at path,
+    - ``{'path': [...], 'op': 'delete'}`` deletes a dict key,
+    - ``{'path': [...], 'op': 'splice', 'value': [start, delete_count, *items]}`` splices the list at path.
+
+    Sub-values that are the same objects are not compared, so ``old`` should be a copy
+    (if a sub-value was changed in place, it would be the same object in both, see ``Model._remember_sent``).
+
+    :return: the operations, or None if there would be more than ``max_ops`` of them
+        (then it is cheaper to set the whole value).
+    """
+    ops = []
+    stack = [([], old, new)]
+    while stack:
+        path, a, b = stack.pop()
+        if a is b:
+            continue
+        if type(a) is not type(b) or type(a) not in {dict, list}:
+            if a != b or type(a) is not type(b):
+                ops.append({'path': path, 'value': b})
+        elif type(a) is dict:
+            for key in a:
+                if key not in b:
+                    ops.append({'path': path + [key], 'op': 'delete'})
+            for key, value in b.items():
+                if key in a:
+                    stack.append((path + [key], a[key], value))
+                else:
+                    ops.append({'path': path + [key], 'value': value})
+        else:
+            common = min(len(a), len(b))
+            if len(a) != len(b):
+                ops.append({'path': path, 'op': 'splice', 'value': [common, len(a) - common] + b[common:]})
+            for i in range(common):
+                stack.append((path + [i], a[i], b[i]))
+        if len(ops) > max_ops:
+            return None
+    return ops
+
+
+class ModelDataQueue:
+    """
+    Ordered queue of model updates, ``{'id': model_id, 'path': [...], 'value': ...}``.
+
+    The queue is indexed by model id and path prefix,
+    so an update drops every queued update of the same model that it overwrites:
+    the ones whose path starts with the new update's path.
+    (A write to ``['a']`` makes a queued write to ``['a', 'b']`` redundant, but not vice versa.)
+
+    Splices (``'op': 'splice'``) do not overwrite anything, they are kept in order after the queued updates.
+    The updates queued before a splice are not overwritten by later updates of the items,
+    since the items' indices change.
+    """
+
+    class _Node:
+        __slots__ = ('seqs', 'children')
+
+        def __init__(self):
+            self.seqs: List[int] = []
+            self.children: Dict[any, 'ModelDataQueue._Node'] = {}
+
+    def __init__(self):
+        self._entries: Dict[int, dict] = OrderedDict()
+        self._roots: Dict[int, ModelDataQueue._Node] = {}
+        self._seq = 0
+
+    def push(self, entry: dict) -> None:
+        node = self._roots.setdefault(entry['id'], self._Node())
+        parent, segment = None, None
+        for segment in entry['path']:
+            parent = node
+            node = node.children.setdefault(segment, self._Node())
+        if entry.get('op') == 'splice':
+            node.seqs = self._subtree_seqs(node)
+            node.children = {}
+            self._seq += 1
+            self._entries[self._seq] = entry
+            node.seqs.append(self._seq)
+            return
+        self._drop_subtree(node)
+        if parent is None:
+            node = self._roots[entry['id']] = self._Node()
+        else:
+            node = parent.children[segment] = self._Node()
+        self._seq += 1
+        self._entries[self._seq] = entry
+        node.seqs.append(self._seq)
+
+    def _drop_subtree(self, node: '_Node') -> None:
+        for seq in self._subtree_seqs(node):
+            del self._entries[seq]
+
+    @staticmethod
+    def _subtree_seqs(node: '_Node') -> List[int]:
+        seqs = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            seqs.extend(node.seqs)
+            stack.extend(node.children.values())
+        return sorted(seqs)
+
+    def first(self) -> Optional[dict]:
+        return next(iter(self._entries.values()), None)
+
+    def pop_all(self) -> List[dict]:
+        entries = list(self._entries.values())
+        self.clear()
+        return entries
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._roots.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LRUCache:
+    """
+    A dict-like cache that keeps at most ``max_size`` items, dropping the least recently used ones.
+    It is thread-safe.
+    """
+    MISSING = object()
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: Dict[Hashable, any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                self._items.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._items[key]
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key: Hashable):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
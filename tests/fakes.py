@@ -0,0 +1,18 @@
+class FakeGui:
+    __name__ = 'webview.platforms.gtk'
+
+
+class FakeWindow:
+    """
+    Stands in for a pywebview window: it records the code sent to the frontend.
+    """
+    gui = FakeGui
+
+    def __init__(self):
+        self.calls = []
+
+    def evaluate_js(self, code):
+        self.calls.append(code)
+
+    def destroy(self):
+        pass
@@ -0,0 +1,387 @@
+import asyncio
+import datetime
+import gc
+import json
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+
+from quasargui import Div, QButton, Rows
+from quasargui.base import EventCallbacks
+from quasargui.callbacks import background, ResultCallback
+from quasargui import event_loop
+from quasargui.main import Api, JsApi
+from quasargui.model import Model
+from quasargui.tools import join_js
+from fakes import FakeWindow
+
+
+def sent_patches(window, command):
+    """
+    :return: the patches of the calls of ``app.<command>(patches, ...)``
+    """
+    prefix = 'app.{}('.format(command)
+    patches = []
+    for code in window.calls:
+        if code.startswith(prefix):
+            args = json.loads('[' + code[len(prefix):-1] + ']')
+            patches.extend(args[0])
+    return patches
+
+
+class TestComponentPatches(TestCase):
+    def test_main_component_set_before_init(self):
+        button = QButton('button')
+        div = Div(children=[button])
+        api = Api(Div())
+        api.set_main_component(div)
+        window = FakeWindow()
+        api.init(window)
+        patches = sent_patches(window, 'setMainComponent')
+        self.assertEqual({patch['id'] for patch in patches}, {div.id, button.id})
+        self.assertTrue(all('descriptor' in patch for patch in patches))
+
+    def test_removed_children_are_forgotten(self):
+        button = QButton('button')
+        div = Div(children=[button])
+        api = Api(div)
+        api.init(FakeWindow())
+        self.assertIn(button.id, api._sent_components)
+        div.set_children([])
+        self.assertNotIn(button.id, api._sent_components)
+        self.assertNotIn(button.id, api._sent_vues)
+
+    def test_concurrent_updates(self):
+        buttons = [QButton(str(i)) for i in range(10)]
+        div = Div(children=buttons)
+        api = Api(div)
+        window = FakeWindow()
+        api.init(window)
+
+        def update(button):
+            for i in range(50):
+                button.props['label'] = '{}-{}'.format(button.id, i)
+                button.update()
+
+        threads = [threading.Thread(target=update, args=(button,)) for button in buttons]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        labels = {}
+        for patch in sent_patches(window, 'patchComponents'):
+            if patch['id'] in api._sent_components and 'label' in patch.get('props', {}):
+                labels[patch['id']] = patch['props']['label']
+        for button in buttons:
+            self.assertEqual(labels[button.id], '{}-49'.format(button.id))
+            self.assertEqual(api._sent_components[button.id]['props']['label'], '{}-49'.format(button.id))
+
+
+class TestEventCallbacks(TestCase):
+    def test_moved_child_keeps_callbacks(self):
+        clicks = []
+        button = QButton('button', events={'click': lambda: clicks.append(1)})
+        a, b = Div(children=[button]), Div()
+        api = Api(Div(children=[a, b]))
+        api.init(FakeWindow())
+        cb_id = button.vue['events']['click']
+        b.set_children([button])
+        a.set_children([])
+        EventCallbacks.get(cb_id)()
+        self.assertEqual(clicks, [1])
+
+    def test_moved_grandchild_keeps_callbacks(self):
+        clicks = []
+        button = QButton('button', events={'click': lambda: clicks.append(1)})
+        x = Div(children=[button])
+        a, b = Div(children=[x]), Div()
+        api = Api(Div(children=[a, b]))
+        api.init(FakeWindow())
+        cb_id = button.vue['events']['click']
+        b.set_children([button])
+        a.set_children([])
+        EventCallbacks.get(cb_id)()
+        self.assertEqual(clicks, [1])
+        self.assertIn(button.id, api._sent_components)
+        self.assertNotIn(x.id, api._sent_components)
+
+    def test_rewrapped_children_are_not_sent_again(self):
+        buttons = [QButton(str(i)) for i in range(5)]
+        rows = Rows(children=buttons)
+        api = Api(rows)
+        window = FakeWindow()
+        api.init(window)
+        window.calls.clear()
+        rows.set_children(buttons + [QButton('new')])  # every child gets a new wrapper Div
+        sent_ids = {patch['id'] for patch in sent_patches(window, 'patchComponents')}
+        self.assertFalse(sent_ids & {button.id for button in buttons})
+
+    def test_removed_child_releases_callbacks(self):
+        button = QButton('button', events={'click': lambda: None})
+        div = Div(children=[button])
+        api = Api(div)
+        api.init(FakeWindow())
+        cb_id = button.vue['events']['click']
+        div.set_children([])
+        self.assertNotIn(cb_id, EventCallbacks.callbacks)
+        div.set_children([button])
+        self.assertIn(cb_id, EventCallbacks.callbacks)
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.model = Model(0)
+        self.api = Api(Div(props={'title': self.model}))
+        self.window = FakeWindow()
+        self.api.init(self.window)
+        self.window.calls.clear()
+
+    def set_data_calls(self):
+        return [code for code in self.window.calls if code.startswith('app.setData(')]
+
+    def test_updates_are_coalesced(self):
+        with self.api.batch():
+            for i in range(1, 6):
+                self.model.value = i
+            self.assertEqual(self.window.calls, [])
+        self.assertEqual(len(self.set_data_calls()), 1)
+        self.assertEqual(sent_patches(self.window, 'setData'), [{'id': self.model.id, 'path': [], 'value': 5}])
+
+    def test_nested_batches_flush_at_the_outermost(self):
+        with self.api.batch():
+            with self.api.batch():
+                self.model.value = 1
+            self.assertEqual(self.window.calls, [])
+            self.model.value = 2
+        self.assertEqual(sent_patches(self.window, 'setData'), [{'id': self.model.id, 'path': [], 'value': 2}])
+
+    def test_get_model_data_flushes_first(self):
+        with self.api.batch():
+            self.model.value = 1
+            self.api.get_model_data(self.model.id)  # not sent within the batch
+            self.assertEqual(self.window.calls, ['app.getData({})'.format(self.model.id)])
+        self.window.calls.clear()
+        self.api.flush_interval = 10
+        self.model.value = 2
+        self.assertEqual(self.window.calls, [])
+        self.api.get_model_data(self.model.id)
+        self.assertEqual(self.window.calls[-1], 'app.getData({})'.format(self.model.id))
+        self.assertEqual(sent_patches(self.window, 'setData'), [{'id': self.model.id, 'path': [], 'value': 2}])
+        self.api.close_window(exit_if_last=False)
+
+    def test_get_model_data_async(self):
+        self.model.value = 1
+        event_loop.run_coroutine(self.api.get_model_data_async(self.model.id)).result(5)
+        self.assertEqual(self.window.calls[-1], 'app.getData({})'.format(self.model.id))
+
+    def test_flush_interval(self):
+        self.api.flush_interval = 0.05
+        self.model.value = 1
+        self.model.value = 2
+        self.assertEqual(self.window.calls, [])
+        timer = self.api._flush_timer
+        timer.join(5)
+        self.assertEqual(sent_patches(self.window, 'setData'), [{'id': self.model.id, 'path': [], 'value': 2}])
+        self.assertIsNone(self.api._flush_timer)
+
+    def test_close_window_cancels_the_timer(self):
+        self.api.flush_interval = 0.05
+        self.model.value = 1
+        timer = self.api._flush_timer
+        self.api.close_window(exit_if_last=False)
+        timer.join(5)
+        self.assertIsNone(self.api._flush_timer)
+        self.assertEqual(self.window.calls, [])
+
+
+class TestJsApi(TestCase):
+    def test_async_callback_runs_on_the_managed_loop(self):
+        loops = []
+        done = threading.Event()
+
+        async def callback():
+            await asyncio.sleep(0)
+            loops.append(asyncio.get_running_loop())
+            done.set()
+
+        cb_id = EventCallbacks.register(callback)
+        try:
+            self.assertIsNone(JsApi(debug=False).call_cb(cb_id))  # does not wait for the coroutine
+            self.assertTrue(done.wait(5))
+            self.assertEqual(loops, [event_loop.get_event_loop()])
+        finally:
+            EventCallbacks.remove(cb_id)
+
+    def call(self, fun, params=None, api=None):
+        cb_id = EventCallbacks.register(fun)
+        try:
+            return JsApi(debug=False, api=api).call_cb(cb_id, params)
+        finally:
+            EventCallbacks.remove(cb_id)
+
+    def test_return_value_is_dropped(self):
+        self.assertIsNone(self.call(lambda: object()))
+
+    def test_result_callback(self):
+        api = Api(Div())
+        result = self.call(ResultCallback(lambda key: [{'key': key, 'date': datetime.date(2021, 3, 4)}]), 'a', api)
+        self.assertEqual(result, [{'key': 'a', 'date': '2021-03-04'}])
+
+
+class TestBackgroundCallbacks(TestCase):
+    start = 'app.$q.loadingBar.start()'
+    stop = 'app.$q.loadingBar.stop()'
+
+    def setUp(self):
+        self.window = FakeWindow()
+        self.api = Api(Div())
+        self.api.init(self.window)
+        self.js_api = JsApi(debug=False, api=self.api)
+        self.cb_ids = []
+
+    def tearDown(self):
+        for cb_id in self.cb_ids:
+            EventCallbacks.remove(cb_id)
+
+    def call(self, fun):
+        cb_id = EventCallbacks.register(fun)
+        self.cb_ids.append(cb_id)
+        self.js_api.call_cb(cb_id)
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_loading_bar_counter(self):
+        release = [threading.Event(), threading.Event()]
+        self.call(background(release[0].wait))
+        self.call(background(release[1].wait))
+        self.assertEqual(self.window.calls.count(self.start), 1)
+        release[0].set()
+        self.wait_until(lambda: self.js_api._n_background == 1)
+        self.assertNotIn(self.stop, self.window.calls)
+        release[1].set()
+        self.wait_until(lambda: self.stop in self.window.calls)
+        self.assertEqual(self.window.calls.count(self.start), 1)
+        self.assertEqual(self.window.calls.count(self.stop), 1)
+
+    def test_without_loading_bar(self):
+        done = threading.Event()
+        self.call(background(done.set, loading_bar=False))
+        self.assertTrue(done.wait(5))
+        self.assertNotIn(self.start, self.window.calls)
+
+    def test_exception(self):
+        def fail():
+            raise ValueError('failed in background')
+
+        with redirect_stdout(StringIO()) as out:
+            self.call(background(fail))
+            self.wait_until(lambda: self.stop in self.window.calls)
+        self.assertIn('failed in background', out.getvalue())
+        self.assertEqual(self.js_api._n_background, 0)
+
+
+class TestDropModelData(TestCase):
+    def test_collected_model_is_dropped(self):
+        model = Model({'a': 1})
+        div = Div(props={'title': model})
+        api = Api(Div(children=[div]))
+        window = FakeWindow()
+        api.init(window)
+        model_id = model.id
+        api.main_component.set_children([])
+        del model, div
+        gc.collect()
+        self.assertNotIn(model_id, Model.model_dic)
+        api.flush_model_data()
+        self.assertIn('app.dropData([{}])'.format(model_id), window.calls)
+
+    def test_drop_from_other_threads(self):
+        api = Api(Div())
+        window = FakeWindow()
+        api.init(window)
+        threads = [threading.Thread(target=lambda i=i: [api.drop_model_data(i * 1000 + j) for j in range(1000)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            api.flush_model_data()
+        api.flush_model_data()
+        dropped = []
+        for code in window.calls:
+            if code.startswith('app.dropData('):
+                dropped.extend(json.loads(code[len('app.dropData('):-1]))
+        self.assertEqual(sorted(dropped), list(range(4000)))
+
+
+class BlockingWindow(FakeWindow):
+    """
+    The first evaluate_js waits until ``release`` is set, calls starting with 'get' return a result.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def evaluate_js(self, code):
+        if not self.calls:
+            self.release.wait(5)
+        super().evaluate_js(code)
+        return 'result of ' + code if code.startswith('get') else None
+
+
+class TestAsyncSend(TestCase):
+    def setUp(self):
+        self.window = BlockingWindow()
+        self.api = Api(Div())
+        self.api.async_send = True
+        self.api.init(self.window)  # its calls wait in the queue until release is set
+        self.window.calls.clear()
+
+    def tearDown(self):
+        self.window.release.set()
+        if self.api._window is not None:
+            self.api.close_window(exit_if_last=False)
+
+    def test_order_and_coalescing(self):
+        self.api.evaluate_js('first()')
+        self.api.evaluate_js('a()')
+        self.api.evaluate_js('b()')
+        self.window.release.set()
+        self.assertEqual(self.api._call('get()'), 'result of get()')
+        self.assertEqual(self.window.calls[-1], 'get()')
+        queued = ''.join(self.window.calls[:-1])
+        self.assertLess(queued.index('first()'), queued.index('a()'))
+        self.assertLess(queued.index('a()'), queued.index('b()'))
+        self.assertIn(join_js(['a()', 'b()']), queued)  # sent together while the sender was busy
+
+    def test_call_waits_for_queued_calls(self):
+        self.api.evaluate_js('a()')
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.api._call('get()')))
+        thread.start()
+        thread.join(0.1)
+        self.assertEqual(results, [])  # the sender is still blocked by a()
+        self.window.release.set()
+        thread.join(5)
+        self.assertEqual(results, ['result of get()'])
+        self.assertLess(''.join(self.window.calls).index('a()'), ''.join(self.window.calls).index('get()'))
+
+    def test_shutdown(self):
+        self.api.evaluate_js('a()')
+        sender = self.api._sender_thread
+        self.window.release.set()
+        self.api.close_window(exit_if_last=False)
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+        self.assertIsNone(self.api._send_queue)
+
+
+if __name__ == '__main__':
+    unittest.main()
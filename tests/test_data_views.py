@@ -0,0 +1,110 @@
+import json
+import unittest
+from unittest import TestCase
+
+from quasargui import Div
+from quasargui.data_views import ListDataSource, VirtualList
+from quasargui.main import Api
+from fakes import FakeWindow
+
+
+class TestListDataSource(TestCase):
+    def setUp(self):
+        self.rows = [
+            {'id': 1, 'name': 'Banana', 'price': 3},
+            {'id': 2, 'name': 'apple', 'price': None},
+            {'id': 3, 'name': 'Cherry', 'price': 1},
+            {'id': 4, 'name': 'pineapple', 'price': 2},
+        ]
+        self.source = ListDataSource(self.rows)
+
+    def ids(self, rows):
+        return [row['id'] for row in rows]
+
+    def test_fetch(self):
+        self.assertEqual(self.ids(self.source.fetch(0, 2)), [1, 2])
+        self.assertEqual(self.ids(self.source.fetch(2, 10)), [3, 4])
+        self.assertEqual(self.source.fetch(10, 2), [])
+
+    def test_count(self):
+        self.assertEqual(self.source.count(), 4)
+        self.assertEqual(self.source.count('apple'), 2)
+
+    def test_filter(self):
+        self.assertEqual(self.ids(self.source.fetch(0, 10, filter='APPLE')), [2, 4])
+        self.assertEqual(self.ids(self.source.fetch(1, 10, filter='apple')), [4])
+        self.assertEqual(self.ids(self.source.fetch(0, 10, filter='3')), [1, 3])  # any value matches
+
+    def test_sort(self):
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('name', False))), [1, 3, 2, 4])
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('name', True))), [4, 2, 3, 1])
+        self.assertEqual(self.ids(self.source.fetch(0, 2, sort=('name', True))), [4, 2])
+
+    def test_sort_with_none(self):
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('price', False))), [3, 4, 1, 2])
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('price', True))), [1, 4, 3, 2])
+
+    def test_sort_missing_column(self):
+        self.rows[0].pop('price')
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('price', False))), [3, 4, 1, 2])
+
+    def test_sort_mixed_types(self):
+        self.rows[0]['price'] = 'n/a'
+        self.assertEqual(self.ids(self.source.fetch(0, 10, sort=('price', False))), [3, 4, 1, 2])
+
+    def test_sort_does_not_change_rows(self):
+        self.source.fetch(0, 10, sort=('price', True))
+        self.assertEqual(self.ids(self.rows), [1, 2, 3, 4])
+
+
+class CountingDataSource(ListDataSource):
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.fetched = []
+
+    def fetch(self, offset, limit, sort=None, filter=None):
+        self.fetched.append(offset)
+        return super().fetch(offset, limit, sort, filter)
+
+
+class TestVirtualList(TestCase):
+    def setUp(self):
+        self.source = CountingDataSource([{'id': i} for i in range(1000)])
+        self.list = VirtualList(self.source, page_size=10, prefetch=10, max_pages=5)
+        self.list.reload()
+        self.source.fetched.clear()
+
+    def scroll(self, start, end):
+        self.list._scrolled({'from': start, 'to': end})
+
+    def test_prefetch(self):
+        self.assertEqual(self.list.size.value, 1000)
+        self.assertEqual(list(self.list.pages.value), [0])
+        self.scroll(0, 20)
+        self.assertEqual(sorted(self.list.pages.value), [0, 1, 2])
+        self.assertEqual(self.source.fetched, [10, 20])  # page 0 is not fetched again
+        self.assertEqual([row['id'] for row in self.list.pages.value[2]], list(range(20, 30)))
+
+    def test_far_pages_are_dropped(self):
+        self.scroll(0, 20)
+        self.scroll(100, 120)
+        self.assertEqual(sorted(self.list.pages.value), [2, 9, 10, 11, 12])
+
+    def test_last_page(self):
+        self.scroll(990, 1000)
+        self.assertEqual(sorted(self.list.pages.value), [0, 98, 99])
+
+    def test_pages_are_readonly(self):
+        window = FakeWindow()
+        Api(Div(children=[self.list])).init(window)
+        entries = []
+        for code in window.calls:
+            for line in code.split('\n'):
+                if line.startswith('app.setData('):
+                    entries.extend(json.loads(line[len('app.setData('):-1]))
+        pages_entries = [entry for entry in entries if entry['id'] == self.list.pages.id]
+        self.assertTrue(pages_entries[0].get('readonly'))  # the frontend does not watch it
+
+
+if __name__ == '__main__':
+    unittest.main()
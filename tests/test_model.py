@@ -0,0 +1,217 @@
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from quasargui import Div
+from quasargui.event_loop import run_coroutine
+from quasargui.main import Api
+from quasargui.model import Model, Computed
+from fakes import FakeWindow
+
+
+class TestComputedScheduler(TestCase):
+    def test_callback_sees_new_dependent_value(self):
+        a = Model(1)
+        b = Computed(lambda x: x * 10, a)
+        self.assertEqual(b.value, 10)
+        seen = []
+        a.add_callback(lambda: seen.append(b.value))
+        a.value = 2
+        self.assertEqual(seen, [20])
+
+    def test_callback_sees_new_indirect_dependent_value(self):
+        a = Model(1)
+        b = Computed(lambda x: x * 10, a)
+        c = Computed(lambda x: x + 1, b)
+        self.assertEqual(c.value, 11)
+        seen = []
+        a.add_callback(lambda: seen.append(c.value))
+        a.value = 2
+        self.assertEqual(seen, [21])
+
+    def test_diamond_is_calculated_once(self):
+        a = Model(1)
+        b = Computed(lambda x: x + 1, a)
+        c = Computed(lambda x: x * 2, a)
+        calls = []
+
+        def d_fun(x, y):
+            calls.append((x, y))
+            return x + y
+
+        d = Computed(d_fun, b, c)
+        d.add_callback(lambda: None)  # observed, so it is calculated eagerly
+        self.assertEqual(d.value, 4)
+        calls.clear()
+        a.value = 2
+        self.assertEqual(calls, [(3, 4)])
+        self.assertEqual(d.value, 7)
+
+    def test_levels(self):
+        a = Model(1)
+        b = Computed(lambda x: x, a)
+        c = Computed(lambda x: x, b)
+        d = Computed(lambda x, y: x + y, a, c)
+        self.assertEqual((b._level, c._level, d._level), (1, 2, 3))
+        order = []
+        for name, computed in [('b', b), ('c', c), ('d', d)]:
+            computed.add_callback(lambda name=name: order.append(name))
+        a.value = 2
+        self.assertEqual(order, ['b', 'c', 'd'])
+        self.assertEqual(d.value, 4)
+
+    def test_raising_computed(self):
+        a = Model(1)
+
+        def fail(x):
+            if x == 2:
+                raise ValueError('no 2')
+            return x
+
+        b = Computed(fail, a)
+        c = Computed(lambda x: x * 10, a)
+        for computed in [b, c]:
+            computed.add_callback(lambda: None)
+        self.assertEqual((b.value, c.value), (1, 10))
+        with redirect_stdout(io.StringIO()) as out:
+            a.value = 2
+        self.assertIn('no 2', out.getvalue())
+        self.assertEqual((b.value, c.value), (1, 20))  # b keeps its last value
+        a.value = 3
+        self.assertEqual((b.value, c.value), (3, 30))
+
+
+class TestLazyComputed(TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def counted(self, x):
+        self.calls += 1
+        return x * 10
+
+    def test_detached_is_calculated_when_read(self):
+        a = Model(1)
+        b = Computed(self.counted, a)
+        self.assertEqual(self.calls, 0)
+        a.value = 2
+        a.value = 3
+        self.assertEqual(self.calls, 0)
+        self.assertTrue(b._dirty)
+        self.assertEqual(b.value, 30)
+        self.assertEqual(b.value, 30)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(b._dirty)
+
+    def test_with_callback_is_eager(self):
+        a = Model(1)
+        b = Computed(self.counted, a)
+        values = []
+        b.add_callback(lambda: values.append(b.model.value))
+        a.value = 2
+        self.assertEqual(values, [20])
+        self.assertFalse(b._dirty)
+
+    def test_calculated_when_attached(self):
+        a = Model(1)
+        b = Computed(self.counted, a)
+        a.value = 2
+        div = Div(props={'title': b})
+        Api(div).init(FakeWindow())
+        self.assertEqual(self.calls, 1)
+        a.value = 3  # attached, so it is sent right away
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(b.model.value, 30)
+
+    def test_lazy_in_the_middle_of_a_chain(self):
+        a = Model(1)
+        b = Computed(self.counted, a)  # lazy
+        c = Computed(lambda x: x + 1, b)
+        values = []
+        c.add_callback(lambda: values.append(c.model.value))
+        a.value = 2
+        self.assertEqual(values, [21])
+
+
+class TestWaitFor(TestCase):
+    def test_resolves_on_change(self):
+        model = Model(0)
+        future = run_coroutine(model.wait_for(lambda value: value >= 2, timeout=5))
+        model.value = 1
+        model.value = 2
+        self.assertEqual(future.result(5), 2)
+        self.assertEqual(model.callbacks, [])
+
+    def test_already_satisfied(self):
+        self.assertEqual(run_coroutine(Model('done').wait_for('done')).result(5), 'done')
+
+
+def sent_data(window):
+    """
+    :return: the entries of the calls of ``app.setData(payload)``
+    """
+    entries = []
+    for code in window.calls:
+        for line in code.split('\n'):
+            if line.startswith('app.setData('):
+                entries.extend(json.loads(line[len('app.setData('):-1]))
+    return entries
+
+
+class TestListMethods(TestCase):
+    def setUp(self):
+        self.model = Model([1, 2, 3])
+        self.window = FakeWindow()
+        Api(Div(props={'title': self.model})).init(self.window)
+        self.window.calls.clear()
+
+    def assertSentSplice(self, *args):
+        self.assertEqual(sent_data(self.window), [
+            {'id': self.model.id, 'path': [], 'op': 'splice', 'value': list(args)}
+        ])
+
+    def test_append(self):
+        self.model.append(4)
+        self.assertEqual(self.model.value, [1, 2, 3, 4])
+        self.assertSentSplice(3, 0, 4)
+
+    def test_extend(self):
+        self.model.extend([4, 5])
+        self.assertEqual(self.model.value, [1, 2, 3, 4, 5])
+        self.assertSentSplice(3, 0, 4, 5)
+
+    def test_insert_with_negative_index(self):
+        self.model.insert(-1, 'x')
+        self.assertEqual(self.model.value, [1, 2, 'x', 3])
+        self.assertSentSplice(2, 0, 'x')
+
+    def test_splice(self):
+        self.assertEqual(self.model.splice(0, 2, 'a'), [1, 2])
+        self.assertEqual(self.model.value, ['a', 3])
+        self.assertSentSplice(0, 2, 'a')
+
+    def test_pop(self):
+        self.assertEqual(self.model.pop(), 3)
+        self.assertEqual(self.model.pop(0), 1)
+        self.assertEqual(self.model.value, [2])
+        self.assertEqual([entry['value'] for entry in sent_data(self.window)], [[2, 1], [0, 1]])
+
+    def test_pop_empty(self):
+        self.model.value = []
+        self.window.calls.clear()
+        with self.assertRaises(IndexError):
+            self.model.pop()
+        self.assertEqual(self.window.calls, [])
+
+    def test_conversion_sends_whole_value(self):
+        model = Model([1, 2], from_python=lambda value: [str(item) for item in value])
+        window = FakeWindow()
+        Api(Div(props={'title': model})).init(window)
+        window.calls.clear()
+        model.append(3)
+        self.assertEqual(sent_data(window), [{'id': model.id, 'path': [], 'value': ['1', '2', '3']}])
+
+
+if __name__ == '__main__':
+    unittest.main()
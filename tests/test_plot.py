@@ -0,0 +1,97 @@
+import time
+import unittest
+from unittest import TestCase, mock
+
+from quasargui import Div, plot
+from quasargui.main import Api
+from quasargui.plot import Plot, MATPLOTLIB, MPLD3
+from fakes import FakeWindow
+
+if MATPLOTLIB:
+    # noinspection PyPackageRequirements
+    import matplotlib.pyplot as plt
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@unittest.skipIf(not MATPLOTLIB, 'matplotlib is not installed')
+class TestMaxFps(TestCase):
+    def setUp(self):
+        self.fig, ax = plt.subplots(figsize=(1, 1))
+        ax.plot([1, 2, 3])
+        self.plot = Plot(renderer='png', max_fps=1000)
+
+    def tearDown(self):
+        self.plot._stop_render_thread()
+        plt.close(self.fig)
+
+    def test_redraws_are_coalesced(self):
+        with self.plot.figure_lock:  # the first frame waits for it
+            self.plot.set_figure(self.fig)
+            self.assertTrue(wait_until(lambda: not self.plot._frame_pending.is_set()))
+            for _ in range(3):
+                self.plot.set_figure(self.fig)
+        self.assertTrue(wait_until(lambda: self.plot.rendered_frames == 2))
+        self.assertEqual(self.plot.dropped_frames, 2)
+        self.assertTrue(self.plot.img_src.value.startswith('http://127.0.0.1:'))
+
+    def test_render_thread_stops_on_close(self):
+        api = Api(Div(children=[self.plot]))
+        api.init(FakeWindow())
+        self.plot.set_figure(self.fig)
+        self.assertTrue(wait_until(lambda: self.plot.rendered_frames == 1))
+        render_thread = self.plot._render_thread
+        api.close_window(exit_if_last=False)
+        render_thread.join(5)
+        self.assertFalse(render_thread.is_alive())
+        self.assertIsNone(self.plot._render_thread)
+        self.plot.set_figure(self.fig)  # starts it again
+        self.assertTrue(wait_until(lambda: self.plot.rendered_frames == 2))
+        self.assertEqual(self.plot.dropped_frames, 0)
+
+
+@unittest.skipIf(not MPLD3 or not MATPLOTLIB, 'mpld3 is not installed')
+class TestMpld3(TestCase):
+    def setUp(self):
+        self.fig, ax = plt.subplots(figsize=(1, 1))
+        self.line, = ax.plot([1, 2, 3])
+        ax.set_ylim(0, 10)
+        try:
+            plot.mpld3.fig_to_dict(self.fig)
+        except Exception as e:
+            plt.close(self.fig)
+            self.skipTest('mpld3 does not work with this matplotlib: {}'.format(e))
+
+    def tearDown(self):
+        plt.close(self.fig)
+
+    def redraw(self):
+        figure = Plot(renderer='mpld3')
+        figure.set_figure(self.fig)
+        window = FakeWindow()
+        Api(Div(children=[figure])).init(window)
+        window.calls.clear()
+        self.line.set_ydata([3, 2, 1])
+        figure.set_figure(self.fig)
+        return window.calls
+
+    @unittest.skipIf(not plot.MPLD3_INTERNALS, 'mpld3 is not compatible')
+    def test_data_update(self):
+        calls = self.redraw()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith('updateMpld3Data('))
+
+    def test_without_mpld3_internals(self):
+        with mock.patch.object(plot, 'MPLD3_INTERNALS', False):
+            calls = self.redraw()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith('app.patchComponents('))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import dataclasses
+import datetime
+import json
+import unittest
+from decimal import Decimal
+from unittest import TestCase, mock
+
+from quasargui import main
+from quasargui.main import Serializer
+
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+
+def strict_loads(s: str):
+    # like JSON.parse: NaN and Infinity are not json
+    def reject(constant):
+        raise ValueError('{} is not json'.format(constant))
+
+    return json.loads(s, parse_constant=reject)
+
+
+class SerializerTests:
+    """
+    The same tests for both backends.
+    """
+
+    def dumps(self, value):
+        return Serializer().dumps(value)
+
+    def test_json_values(self):
+        value = {'a': [1, 2.5, 'x', None, True], 'b': {'c': []}}
+        self.assertEqual(strict_loads(self.dumps(value)), value)
+
+    def test_big_int(self):
+        self.assertEqual(strict_loads(self.dumps(2 ** 70)), 2 ** 70)
+
+    def test_nan_and_inf(self):
+        value = [float('nan'), {'a': float('inf')}, (float('-inf'), 1.0)]
+        self.assertEqual(strict_loads(self.dumps(value)), [None, {'a': None}, [None, 1.0]])
+
+    def test_datetime(self):
+        value = [datetime.datetime(2021, 3, 4, 5, 6, 7), datetime.date(2021, 3, 4), datetime.time(5, 6, 7)]
+        self.assertEqual(strict_loads(self.dumps(value)), ['2021-03-04T05:06:07', '2021-03-04', '05:06:07'])
+
+    def test_decimal(self):
+        self.assertEqual(strict_loads(self.dumps([Decimal('1.5'), Decimal('NaN')])), [1.5, None])
+
+    def test_dataclass(self):
+        self.assertEqual(strict_loads(self.dumps([Point(1, 2)])), [{'x': 1, 'y': 2}])
+
+    def test_set(self):
+        self.assertEqual(sorted(strict_loads(self.dumps({1, 2}))), [1, 2])
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_numpy(self):
+        value = {
+            'array': np.array([1.5, np.nan]),
+            'ints': np.arange(3, dtype='int32'),
+            'scalar': np.float32(0.5),
+            'nan': np.float64('nan'),
+        }
+        self.assertEqual(strict_loads(self.dumps(value)), {
+            'array': [1.5, None],
+            'ints': [0, 1, 2],
+            'scalar': 0.5,
+            'nan': None,
+        })
+
+
+@unittest.skipIf(main.orjson is None, 'orjson is not installed')
+class TestOrjsonSerializer(SerializerTests, TestCase):
+    pass
+
+
+class TestJsonSerializer(SerializerTests, TestCase):
+    def dumps(self, value):
+        with mock.patch.object(main, 'orjson', None):
+            return super().dumps(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,15 @@
+import array
+import base64
+import json
 import unittest
 from unittest import TestCase
 
 # noinspection PyProtectedMember
 from quasargui.tools import *
+from quasargui import Div
+from quasargui.main import Api
+from quasargui.model import Model
+from fakes import FakeWindow
 
 
 class TestFlatten(TestCase):
@@ -112,5 +119,253 @@ class TestStrBetween(TestCase):
         self.assertEqual(str_between('not this from what to from not this to', 'from', 'to'), ' what ')
 
 
+class TestEncodeTypedArray(TestCase):
+    def test_float64(self):
+        encoded = encode_typed_array(array.array('d', [1.5, -2]))
+        self.assertEqual(encoded['$typed'], 'float64')
+        self.assertEqual(array.array('d', base64.b64decode(encoded['b64'])).tolist(), [1.5, -2])
+
+    def test_small_int(self):
+        encoded = encode_typed_array(array.array('B', [1, 255]))
+        self.assertEqual(encoded, {'$typed': 'uint8', 'b64': base64.b64encode(bytes([1, 255])).decode()})
+        self.assertEqual(encode_typed_array(array.array('h', [1]))['$typed'], 'int16')
+
+    def test_converted_to_float64(self):
+        self.assertEqual(encode_typed_array(array.array('q', [1, 2]))['$typed'], 'float64')
+        encoded = encode_typed_array([1, 2.5])
+        self.assertEqual(encoded['$typed'], 'float64')
+        self.assertEqual(array.array('d', base64.b64decode(encoded['b64'])).tolist(), [1, 2.5])
+
+
+class TestDownsampling(TestCase):
+    def test_min_max_short(self):
+        x, y = min_max_decimate([0, 1, 2], [5, 6, 7], 2)
+        self.assertEqual(list(x), [0, 1, 2])
+        self.assertEqual(list(y), [5, 6, 7])
+
+    def test_min_max_keeps_peaks(self):
+        y = [0, 9, 1, 2, -5, 3, 4, 4, 1, 1]
+        x, ys = min_max_decimate(range(10), y, 2)
+        self.assertEqual(list(x), [1, 4, 6, 8])
+        self.assertEqual(list(ys), [9, -5, 4, 1])
+
+    def test_min_max_last_bucket(self):
+        x, y = min_max_decimate(range(7), [0, 1, 2, 3, 4, 5, 6], 3)
+        self.assertEqual(list(x), [0, 2, 3, 5, 6])
+
+    def test_lttb(self):
+        x, y = lttb(range(5), [0, 10, 0, 0, 0], 3)
+        self.assertEqual(list(x), [0, 1, 4])
+        self.assertEqual(list(y), [0, 10, 0])
+
+    def test_lttb_short(self):
+        x, y = lttb([0, 1], [1, 2], 3)
+        self.assertEqual(list(y), [1, 2])
+
+
+class TestModelDataQueue(TestCase):
+    @staticmethod
+    def entries(queue):
+        return [(e['id'], e['path'], e.get('value')) for e in queue.pop_all()]
+
+    def test_empty(self):
+        queue = ModelDataQueue()
+        self.assertEqual(len(queue), 0)
+        self.assertIsNone(queue.first())
+        self.assertEqual(queue.pop_all(), [])
+
+    def test_keeps_order(self):
+        queue = ModelDataQueue()
+        queue.push({'id': 2, 'path': [], 'value': 'a'})
+        queue.push({'id': 1, 'path': [], 'value': 'b'})
+        self.assertEqual(queue.first()['id'], 2)
+        self.assertEqual(self.entries(queue), [(2, [], 'a'), (1, [], 'b')])
+        self.assertEqual(len(queue), 0)
+
+    def test_last_write_wins(self):
+        queue = ModelDataQueue()
+        queue.push({'id': 1, 'path': [], 'value': 1})
+        queue.push({'id': 2, 'path': [], 'value': 1})
+        queue.push({'id': 1, 'path': [], 'value': 2})
+        self.assertEqual(self.entries(queue), [(2, [], 1), (1, [], 2)])
+
+    def test_path_subsumption(self):
+        queue = ModelDataQueue()
+        queue.push({'id': 1, 'path': ['a', 'b'], 'value': 1})
+        queue.push({'id': 1, 'path': ['c'], 'value': 1})
+        queue.push({'id': 2, 'path': ['a', 'b'], 'value': 1})
+        queue.push({'id': 1, 'path': ['a'], 'value': {'b': 2}})
+        self.assertEqual(self.entries(queue), [(1, ['c'], 1), (2, ['a', 'b'], 1), (1, ['a'], {'b': 2})])
+
+        queue.push({'id': 1, 'path': ['a', 'b'], 'value': 1})
+        queue.push({'id': 1, 'path': [], 'value': {}})
+        self.assertEqual(self.entries(queue), [(1, [], {})])
+
+    def test_deeper_write_is_kept(self):
+        queue = ModelDataQueue()
+        queue.push({'id': 1, 'path': ['a'], 'value': {'b': 1}})
+        queue.push({'id': 1, 'path': ['a', 'b'], 'value': 2})
+        self.assertEqual(self.entries(queue), [(1, ['a'], {'b': 1}), (1, ['a', 'b'], 2)])
+
+    def test_splice_is_kept(self):
+        queue = ModelDataQueue()
+        queue.push({'id': 1, 'path': [0], 'value': 'a'})
+        queue.push({'id': 1, 'path': [], 'op': 'splice', 'value': [0, 1]})
+        queue.push({'id': 1, 'path': [0], 'value': 'b'})
+        queue.push({'id': 1, 'path': [], 'op': 'splice', 'value': [1, 0, 'c']})
+        self.assertEqual(self.entries(queue), [(1, [0], 'a'), (1, [], [0, 1]), (1, [0], 'b'), (1, [], [1, 0, 'c'])])
+
+        queue.push({'id': 1, 'path': [0], 'value': 'a'})
+        queue.push({'id': 1, 'path': [], 'op': 'splice', 'value': [0, 1]})
+        queue.push({'id': 1, 'path': [], 'value': []})
+        self.assertEqual(self.entries(queue), [(1, [], [])])
+
+
+class TestDiffValues(TestCase):
+    def test_equal(self):
+        self.assertEqual(diff_values({'a': [1, {'b': 2}]}, {'a': [1, {'b': 2}]}), [])
+        self.assertEqual(diff_values(1, 1), [])
+
+    def test_scalar(self):
+        self.assertEqual(diff_values(1, 2), [{'path': [], 'value': 2}])
+        self.assertEqual(diff_values(1, 1.0), [{'path': [], 'value': 1.0}])
+        self.assertEqual(diff_values({'a': 1}, [1]), [{'path': [], 'value': [1]}])
+
+    def test_dict(self):
+        self.assertEqual(diff_values({'a': 1, 'b': 2}, {'a': 1, 'b': 3, 'c': 4}),
+                         [{'path': ['c'], 'value': 4}, {'path': ['b'], 'value': 3}])
+        self.assertEqual(diff_values({'a': {'b': 1, 'c': 2}}, {'a': {'b': 1}}),
+                         [{'path': ['a', 'c'], 'op': 'delete'}])
+
+    def test_list(self):
+        self.assertEqual(diff_values([1, 2, 3], [1, 5, 3]), [{'path': [1], 'value': 5}])
+        self.assertEqual(diff_values([1, 2], [1, 2, 3, 4]), [{'path': [], 'op': 'splice', 'value': [2, 0, 3, 4]}])
+        self.assertEqual(diff_values({'a': [1, 2, 3]}, {'a': [0]}),
+                         [{'path': ['a'], 'op': 'splice', 'value': [1, 2]}, {'path': ['a', 0], 'value': 0}])
+
+    def test_max_ops(self):
+        self.assertIsNone(diff_values(list(range(10)), list(range(1, 11)), max_ops=5))
+        self.assertEqual(len(diff_values(list(range(10)), list(range(1, 11)), max_ops=10)), 10)
+
+
+class TestModelDiff(TestCase):
+    def setUp(self):
+        self.model = Model({'items': [1, 2], 'count': 2})
+        self.window = FakeWindow()
+        Api(Div(props={'title': self.model})).init(self.window)
+        self.window.calls.clear()
+
+    def sent(self):
+        entries = []
+        for code in self.window.calls:
+            if code.startswith('app.setData('):
+                entries.extend(json.loads(code[len('app.setData('):-1]))
+        return [{k: v for k, v in entry.items() if k != 'id'} for entry in entries]
+
+    def test_changed_parts(self):
+        self.model.value = {'items': [1, 2], 'count': 3}
+        self.assertEqual(self.sent(), [{'path': ['count'], 'value': 3}])
+
+    def test_shared_sub_value_changed_in_place(self):
+        value = self.model.value
+        value['items'].append(3)
+        self.model.value = {**value, 'count': 3}
+        self.assertEqual(sorted(self.sent(), key=str), [
+            {'path': ['count'], 'value': 3},
+            {'path': ['items'], 'op': 'splice', 'value': [2, 0, 3]},
+        ])
+
+    def test_value_changed_in_place(self):
+        value = self.model.value
+        value['count'] = 3
+        self.model.value = value
+        self.assertEqual(self.sent(), [{'path': ['count'], 'value': 3}])
+        value['count'] = 4
+        self.model.value = value
+        self.assertEqual(self.sent()[-1], {'path': ['count'], 'value': 4})
+
+    def test_path_model(self):
+        self.model['items'].value = [1, 5]
+        self.model.value = {'items': [1, 5], 'count': 3}
+        self.assertEqual(self.sent(), [{'path': ['items', 1], 'value': 5}, {'path': ['count'], 'value': 3}])
+
+
+class TestJoinJs(TestCase):
+    def test_single(self):
+        self.assertEqual(join_js(['a()']), 'a()')
+
+    def test_independent(self):
+        code = join_js(['a()', 'b()'])
+        self.assertLess(code.index('a()'), code.index('b()'))
+        self.assertEqual(code.count('try {'), 2)
+        self.assertEqual(code.count('catch (e)'), 2)
+
+
+class TestComponentDiff(TestCase):
+    @staticmethod
+    def vue(component_id, children=(), slots=None, **props):
+        return {'id': component_id, 'component': 'div', 'props': props, 'classes': '',
+                'children': list(children), 'slots': slots or {}}
+
+    def test_flatten(self):
+        slot = {'children': [self.vue(3)], 'props': {}}
+        flat = flatten_component_vue(self.vue(1, ['text', self.vue(2)], slots={'header': slot}))
+        self.assertEqual(set(flat), {1, 2, 3})
+        self.assertEqual(flat[1]['children'], ['text', 2])
+        self.assertEqual(flat[1]['slots']['header']['children'], [3])
+
+    def test_flatten_skips_known(self):
+        child = self.vue(2)
+        known = {}
+        self.assertEqual(set(flatten_component_vue(self.vue(1, [child]), known)), {1, 2})
+        self.assertEqual(set(flatten_component_vue(self.vue(1, [child, self.vue(3)]), known)), {1, 3})
+
+    def test_new_descriptor(self):
+        new = self.vue(1)
+        self.assertEqual(diff_component_descriptor(None, new), {'id': 1, 'descriptor': new})
+        old = dict(new, arg='prop1')
+        self.assertEqual(diff_component_descriptor(old, new), {'id': 1, 'descriptor': new})
+
+    def test_no_change(self):
+        self.assertIsNone(diff_component_descriptor(self.vue(1, [2], a=1), self.vue(1, [2], a=1)))
+
+    def test_changes(self):
+        self.assertEqual(
+            diff_component_descriptor(self.vue(1, [2], a=1, b=2), self.vue(1, [2, 3], a=1, b=3, c=4)),
+            {'id': 1, 'changes': {'children': [2, 3]}, 'props': {'b': 3, 'c': 4}})
+        self.assertEqual(
+            diff_component_descriptor(self.vue(1, a=1, b=2), self.vue(1, a=1)),
+            {'id': 1, 'removed_props': ['b']})
+
+
+class TestLRUCache(TestCase):
+    def test_get_put(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        self.assertIs(cache.get('a', LRUCache.MISSING), LRUCache.MISSING)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        self.assertEqual(cache.pop('a'), 1)
+        cache.put('b', 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
 if __name__ == '__main__':
     unittest.main()